@@ -4,11 +4,13 @@ from __future__ import annotations
 import os
 import sys
 import json
+import importlib
 import subprocess
 import sqlite3
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
 from typing import Optional
 
 import streamlit as st
@@ -29,15 +31,44 @@ if ROOT_DIR not in sys.path:
 from db.init_db import init_db
 from db.connection import get_session
 from db.models import User
-from app.ui import dashboard, processos, prazos, agendamentos, andamentos, financeiro
 from app.ui.theme import inject_global_css
 
+# ------------------------------------------------------------
+# MENU / ROTAS (fonte única do menu; literais baratos, refeitos a cada rerun
+# junto com o script, mas sem dicts/listas montados de novo nos widgets)
+# ------------------------------------------------------------
+_MENU_ITEMS: tuple[tuple[str, str], ...] = (
+    ("Dashboard", "📊 Painel"),
+    ("Processos", "📁 Trabalhos"),
+    ("Prazos", "⏳ Prazos"),
+    ("Agendamentos", "📅 Agenda"),
+    ("Andamentos", "🧾 Andamentos"),
+    ("Financeiro", "💰 Financeiro"),
+)
+_MENU_KEYS = tuple(k for k, _ in _MENU_ITEMS)
+_MENU_LABEL = dict(_MENU_ITEMS)
+
+# módulos importados sob demanda: só a tela selecionada paga o import
+_ROUTES = MappingProxyType(
+    {
+        "Dashboard": "app.ui.dashboard",
+        "Processos": "app.ui.processos",
+        "Prazos": "app.ui.prazos",
+        "Agendamentos": "app.ui.agendamentos",
+        "Andamentos": "app.ui.andamentos",
+        "Financeiro": "app.ui.financeiro",
+    }
+)
+
 # ------------------------------------------------------------
 # STREAMLIT CONFIG
 # ------------------------------------------------------------
 Path("data").mkdir(parents=True, exist_ok=True)
 
-load_dotenv()
+# o script roda a cada rerun; o .env só precisa ser lido uma vez por processo
+if not os.getenv("_DOTENV_LOADED"):
+    load_dotenv(override=False)
+    os.environ["_DOTENV_LOADED"] = "1"
 
 st.set_page_config(
     page_title="Gestão Técnica",
@@ -49,8 +80,20 @@ st.set_page_config(
 BUILD_ID = "2026-02-28-DEF-1"
 st.sidebar.success(f"BUILD: {BUILD_ID}")
 
-# ✅ CRIA TABELAS SE NÃO EXISTIREM (Postgres/Neon no Cloud)
-init_db()
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _bootstrap(ano: int) -> bool:
+    """
+    ✅ CRIA TABELAS SE NÃO EXISTIREM (Postgres/Neon no Cloud)
+    Executa uma única vez por processo do Streamlit (não a cada rerun).
+    O ano faz parte da chave: virada de ano com o servidor no ar roda de novo
+    e semeia os feriados do ano novo.
+    """
+    init_db(ano_seed=ano)
+    return True
+
+
+_bootstrap(datetime.now().year)
 
 inject_global_css()
 
@@ -61,24 +104,23 @@ DEFAULT_EMAIL = os.getenv("DEFAULT_USER_EMAIL", "admin@local").strip()
 DEFAULT_NAME = os.getenv("DEFAULT_USER_NAME", "Administrador").strip()
 
 
+@st.cache_resource(show_spinner=False)
 def get_or_create_owner_user_id(default_email: str, default_name: str) -> int:
     """
     Busca usuário pelo email.
     Se não existir, cria e retorna o id.
 
+    - Cacheado por processo (st.cache_resource): o id não muda em runtime,
+      então a consulta roda uma vez e é compartilhada entre sessões.
     - Faz commit apenas quando cria.
     - Faz rollback em qualquer erro.
     - Trata corrida (IntegrityError) caso duas execuções criem ao mesmo tempo.
     """
     with get_session() as s:
         try:
-            user = (
-                s.execute(select(User).where(User.email == default_email))
-                .scalars()
-                .first()
-            )
-            if user:
-                return user.id
+            user_id = s.scalar(select(User.id).where(User.email == default_email))
+            if user_id is not None:
+                return user_id
 
             user = User(name=default_name, email=default_email)
             s.add(user)
@@ -89,14 +131,10 @@ def get_or_create_owner_user_id(default_email: str, default_name: str) -> int:
         except IntegrityError:
             # corrida: outro worker criou o mesmo email
             s.rollback()
-            user = (
-                s.execute(select(User).where(User.email == default_email))
-                .scalars()
-                .first()
-            )
-            if not user:
+            user_id = s.scalar(select(User.id).where(User.email == default_email))
+            if user_id is None:
                 raise
-            return user.id
+            return user_id
 
         except Exception:
             s.rollback()
@@ -113,45 +151,81 @@ except Exception as e:
 # -------------------------
 # PATHS / BACKUP HELPERS
 # -------------------------
+# resolvidos uma vez por execução do script (não a cada chamada)
+_ROOT = Path(__file__).resolve().parents[1]
+_BACKUP_DIR = _ROOT / "backups"
+_BACKUP_MANIFEST = _BACKUP_DIR / "last_backup.json"
+
+
 def _project_root() -> Path:
-    return Path(__file__).resolve().parents[1]
+    return _ROOT
 
 
 def _backup_dir() -> Path:
-    return _project_root() / "backups"
+    return _BACKUP_DIR
 
 
 def _backup_manifest_path() -> Path:
-    return _backup_dir() / "last_backup.json"
+    return _BACKUP_MANIFEST
+
+
+_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
 
 
 def _format_bytes(num: int) -> str:
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if num < 1024:
-            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.2f} {unit}"
-        num /= 1024
-    return f"{num:.2f} PB"
+    if num < 1024:
+        return f"{num} B"
+    # bit_length() - 1 == floor(log2(num)); // 10 dá o expoente de 1024
+    exp = min((num.bit_length() - 1) // 10, len(_UNITS) - 1)
+    return f"{num / (1 << (exp * 10)):.2f} {_UNITS[exp]}"
 
 
-def read_last_backup() -> dict | None:
-    manifest = _backup_manifest_path()
-    if not manifest.exists():
-        return None
+def _parse_manifest(raw: bytes) -> dict | None:
     try:
-        data = json.loads(manifest.read_text(encoding="utf-8"))
+        # json aceita bytes (UTF-8) direto: evita o decode intermediário
+        data = json.loads(raw)
         return data if isinstance(data, dict) else None
     except Exception:
         return None
 
 
-def _check_sqlite_integrity(db_path: Path) -> tuple[bool, str]:
+def read_last_backup(manifest: Path | None = None) -> dict | None:
+    manifest = manifest or _backup_manifest_path()
+    try:
+        return _parse_manifest(manifest.read_bytes())
+    except OSError:
+        return None
+
+
+def _write_manifest_atomic(manifest: Path, payload: dict) -> None:
     """
-    PRAGMA integrity_check no arquivo SQLite (backup).
+    Escrita atômica (tmp + fsync + os.replace): um leitor concorrente vê
+    o manifesto antigo ou o novo, nunca um arquivo truncado.
     """
+    tmp = manifest.with_suffix(".json.tmp")
+    with open(tmp, "wb") as f:
+        f.write(json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, manifest)
+
+
+def _check_sqlite_integrity(db_path: Path, deep: bool = False) -> tuple[bool, str]:
+    """
+    PRAGMA quick_check no arquivo SQLite (backup).
+
+    - quick_check é O(N) e detecta corrupção sem validar UNIQUE/índices.
+    - deep=True usa o integrity_check completo (O(N log N)), mais lento.
+    - Abre somente leitura (immutable=1): sem journal, locks ou WAL recovery.
+    """
+    pragma = "integrity_check" if deep else "quick_check"
     try:
-        conn = sqlite3.connect(str(db_path))
+        # as_uri() faz o percent-encoding (?, #, % no caminho não quebram a URI)
+        uri = f"{db_path.resolve().as_uri()}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True)
         try:
-            row = conn.execute("PRAGMA integrity_check;").fetchone()
+            conn.execute("PRAGMA query_only=ON;")
+            row = conn.execute(f"PRAGMA {pragma};").fetchone()
             msg = (row[0] if row else "unknown").strip()
             ok = msg.lower() == "ok"
             return ok, msg
@@ -162,18 +236,62 @@ def _check_sqlite_integrity(db_path: Path) -> tuple[bool, str]:
 
 
 def run_backup_now() -> None:
+    """
+    Dispara o script de backup em segundo plano (não bloqueia o script runner).
+    O acompanhamento é feito por _backup_progress().
+    """
     root = _project_root()
     script = root / "scripts" / "backup_diario.py"
     if not script.exists():
-        st.error("Script de backup não encontrado em scripts/backup_diario.py")
+        st.session_state["backup_result"] = (
+            False,
+            "Script de backup não encontrado em scripts/backup_diario.py",
+        )
         return
 
     try:
-        with st.spinner("Executando backup..."):
-            subprocess.run([sys.executable, str(script)], check=True)
-        st.success("Backup executado com sucesso.")
-    except subprocess.CalledProcessError as e:
-        st.error(f"Falha ao executar backup: {e}")
+        st.session_state["backup_proc"] = subprocess.Popen(
+            [sys.executable, str(script)]
+        )
+        st.session_state["backup_running"] = True
+    except OSError as e:
+        st.session_state["backup_result"] = (False, f"Falha ao executar backup: {e}")
+
+
+@st.fragment(run_every=1)
+def _backup_progress() -> None:
+    """
+    Enquanto o backup roda, só este fragmento reroda (a cada 1s).
+    Ao terminar, guarda o resultado e pede um rerun completo (manifesto novo).
+    """
+    proc = st.session_state.get("backup_proc")
+    if proc is None:
+        return
+
+    returncode = proc.poll()
+    if returncode is None:
+        st.caption("⏳ Executando backup...")
+        return
+
+    st.session_state["backup_proc"] = None
+    st.session_state["backup_running"] = False
+    if returncode == 0:
+        st.session_state["backup_result"] = (True, "Backup executado com sucesso.")
+    else:
+        st.session_state["backup_result"] = (
+            False,
+            f"Falha ao executar backup (código {returncode}).",
+        )
+    st.rerun()
+
+
+def _prepare_backup_download(path: Path, filename: str) -> None:
+    # lido uma vez, no clique do "Preparar"; fica na sessão até o download
+    st.session_state["backup_download"] = (filename, path.read_bytes())
+
+
+def _clear_backup_download() -> None:
+    st.session_state.pop("backup_download", None)
 
 
 # -------------------------
@@ -191,6 +309,7 @@ class BackupState:
         str  # "Integridade ok" | "Integridade: ..." | "Integridade: não verificada"
     )
     checked_at: Optional[str]
+    integrity_ok: Optional[bool] = None
 
 
 def _build_backup_state(last: dict | None) -> BackupState:
@@ -211,8 +330,9 @@ def _build_backup_state(last: dict | None) -> BackupState:
     size_bytes = last.get("size_bytes")
     checked_at = last.get("integrity_checked_at")
 
+    # existência do arquivo é conferida fora do cache (ver get_backup_state)
     path = (_backup_dir() / filename).resolve() if filename else None
-    exists = bool(path and path.exists())
+    exists = path is not None
 
     # tamanho
     size_str = _format_bytes(size_bytes) if isinstance(size_bytes, int) else ""
@@ -240,9 +360,37 @@ def _build_backup_state(last: dict | None) -> BackupState:
         integrity_label=integrity_label,
         integrity_detail=integrity_detail,
         checked_at=checked_at,
+        integrity_ok=integrity_ok if isinstance(integrity_ok, bool) else None,
     )
 
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_backup_state(manifest_path: str, mtime_ns: int) -> BackupState:
+    """
+    Cache por (caminho, mtime) do manifesto: só relê o JSON quando o
+    script de backup (ou a verificação manual) reescreve o arquivo.
+    """
+    try:
+        raw = Path(manifest_path).read_bytes()
+    except OSError:
+        return _build_backup_state(None)
+    return _build_backup_state(_parse_manifest(raw))
+
+
+def get_backup_state() -> BackupState:
+    manifest = _backup_manifest_path()
+    try:
+        mtime_ns = os.stat(manifest).st_mtime_ns
+    except FileNotFoundError:
+        return _build_backup_state(None)
+    state = _load_backup_state(str(manifest), mtime_ns)
+    # fora do cache: o backup pode ser apagado sem o manifesto mudar; são
+    # arquivos regulares locais, então lexists (sem seguir symlink) basta
+    if state.path is not None and not os.path.lexists(state.path):
+        state = replace(state, exists=False)
+    return state
+
+
 # -------------------------
 # SIDEBAR
 # -------------------------
@@ -250,15 +398,6 @@ st.sidebar.markdown("## 📐 Gestão Técnica")
 st.sidebar.caption("Trabalhos • Prazos • Agenda • Financeiro")
 st.sidebar.divider()
 
-MENU_LABELS = {
-    "Dashboard": "📊 Painel",
-    "Processos": "📁 Trabalhos",
-    "Prazos": "⏳ Prazos",
-    "Agendamentos": "📅 Agenda",
-    "Andamentos": "🧾 Andamentos",
-    "Financeiro": "💰 Financeiro",
-}
-
 # Navegação segura
 if "nav_target" in st.session_state:
     st.session_state["sidebar_menu"] = st.session_state.pop("nav_target")
@@ -266,8 +405,8 @@ if "nav_target" in st.session_state:
 st.sidebar.subheader("Menu")
 menu = st.sidebar.radio(
     label="Menu",
-    options=list(MENU_LABELS.keys()),
-    format_func=lambda k: MENU_LABELS[k],
+    options=_MENU_KEYS,
+    format_func=_MENU_LABEL.__getitem__,
     key="sidebar_menu",
     label_visibility="collapsed",
 )
@@ -282,11 +421,11 @@ if st.sidebar.button(
 
 # ---- Backup
 st.session_state.setdefault("backup_running", False)
+st.session_state.setdefault("backup_proc", None)
 st.session_state.setdefault("backup_confirm", False)
 st.session_state.setdefault("backup_confirm_reset", False)
 
-last = read_last_backup()
-state = _build_backup_state(last)
+state = get_backup_state()
 
 with st.sidebar.expander(f"📦 Backup  •  {state.integrity_label}", expanded=False):
 
@@ -301,16 +440,35 @@ with st.sidebar.expander(f"📦 Backup  •  {state.integrity_label}", expanded=
     col1, col2 = st.columns(2)
 
     with col1:
-        if state.exists and state.path:
-            with open(state.path, "rb") as f:
-                st.download_button(
-                    label="⬇️ Baixar",
-                    data=f,
-                    file_name=state.filename,
-                    mime="application/octet-stream",
-                    use_container_width=True,
-                    key="download_backup_btn",
-                )
+        prepared = st.session_state.get("backup_download")
+        if prepared and prepared[0] != state.filename:
+            # backup novo desde o "Preparar": descarta os bytes antigos
+            _clear_backup_download()
+            prepared = None
+
+        if state.exists and state.path and prepared:
+            # ✅ o arquivo (pode ter centenas de MB) só é lido quando o usuário
+            # pede, uma vez; outras interações não o releem nem somem com o botão.
+            # st.download_button exige o conteúdo inteiro (sem streaming), então
+            # os bytes são liberados assim que o download é clicado
+            st.download_button(
+                label="⬇️ Baixar",
+                data=prepared[1],
+                file_name=state.filename,
+                mime="application/octet-stream",
+                use_container_width=True,
+                key="download_backup_btn",
+                on_click=_clear_backup_download,
+            )
+        elif state.exists and state.path:
+            st.button(
+                "📦 Preparar",
+                use_container_width=True,
+                key="prepare_backup_download_btn",
+                help="Carrega o arquivo de backup para download",
+                on_click=_prepare_backup_download,
+                args=(state.path, state.filename),
+            )
         else:
             st.button(
                 "⬇️ Baixar",
@@ -330,41 +488,40 @@ with st.sidebar.expander(f"📦 Backup  •  {state.integrity_label}", expanded=
         )
 
     # Integridade manual (só se o manifest ainda não tiver)
-    if state.exists and state.path and (last or {}).get("integrity_ok", None) is None:
+    if state.exists and state.path and state.integrity_ok is None:
+        st.checkbox(
+            "Verificação profunda",
+            key="check_integrity_deep",
+            help="Usa PRAGMA integrity_check (mais lento em backups grandes).",
+        )
         if st.button(
             "🧪 Verificar integridade agora",
             use_container_width=True,
             key="check_integrity_btn",
         ):
-            ok, msg = _check_sqlite_integrity(state.path)
+            deep = bool(st.session_state.get("check_integrity_deep", False))
+            ok, msg = _check_sqlite_integrity(state.path, deep=deep)
+            mode = "integrity_check" if deep else "quick_check"
 
             manifest = _backup_manifest_path()
-            try:
-                payload = (
-                    json.loads(manifest.read_text(encoding="utf-8"))
-                    if manifest.exists()
-                    else {}
-                )
-            except Exception:
-                payload = {}
+            payload = read_last_backup(manifest) or {}
 
             payload.update(
                 {
                     "integrity_ok": bool(ok),
                     "integrity_message": None if ok else msg,
-                    "integrity_checked_at": datetime.now().strftime(
-                        "%Y-%m-%d %H:%M:%S"
+                    "integrity_mode": mode,
+                    "integrity_checked_at": datetime.now().isoformat(
+                        sep=" ", timespec="seconds"
                     ),
                 }
             )
 
-            manifest.write_text(
-                json.dumps(payload, ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+            _write_manifest_atomic(manifest, payload)
             st.rerun()
 
-    with st.expander("Detalhes", expanded=False):
+    # toggle em vez de expander aninhado: um container a menos por rerun
+    if st.toggle("Detalhes", key="backup_details"):
         st.caption(f"Arquivo: {state.filename or '—'}")
         if state.size_str:
             st.caption(f"Tamanho: {state.size_str}")
@@ -373,10 +530,19 @@ with st.sidebar.expander(f"📦 Backup  •  {state.integrity_label}", expanded=
         if state.filename and not state.exists:
             st.warning("Arquivo de backup não encontrado na pasta backups.")
 
+    if st.session_state["backup_proc"] is not None:
+        _backup_progress()
+
+    backup_result = st.session_state.pop("backup_result", None)
+    if backup_result:
+        ok, msg = backup_result
+        if ok:
+            st.success(msg)
+        else:
+            st.error(msg)
+
     if execute_clicked:
-        st.session_state["backup_running"] = True
         run_backup_now()
-        st.session_state["backup_running"] = False
 
         # ✅ pede reset para o próximo run (antes do checkbox)
         st.session_state["backup_confirm_reset"] = True
@@ -386,13 +552,4 @@ with st.sidebar.expander(f"📦 Backup  •  {state.integrity_label}", expanded=
 # -------------------------
 # ROTAS
 # -------------------------
-ROUTES = {
-    "Dashboard": dashboard.render,
-    "Processos": processos.render,
-    "Prazos": prazos.render,
-    "Agendamentos": agendamentos.render,
-    "Andamentos": andamentos.render,
-    "Financeiro": financeiro.render,
-}
-
-ROUTES[menu](owner_user_id)
+importlib.import_module(_ROUTES[menu]).render(owner_user_id)
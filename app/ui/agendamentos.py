@@ -1,9 +1,10 @@
 # app/ui/agendamentos.py
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import date, datetime
-from typing import Dict, List, Optional
+from datetime import date, datetime, time
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
@@ -11,7 +12,10 @@ from sqlalchemy import select
 
 from db.connection import get_session
 from db.models import Processo
+from core.utils import now_br
 from core.agendamentos_service import (
+    AgendamentoPickerItem,
+    AgendamentoRecord,
     AgendamentosService,
     AgendamentoCreate,
     AgendamentoUpdate,
@@ -26,17 +30,41 @@ from app.ui.components import page_header
 # -------------------------
 # Helpers
 # -------------------------
-@dataclass(frozen=True)
-class ProcMaps:
-    labels: List[str]
-    label_to_id: Dict[str, int]
+# teto de opções por selectbox de trabalho (acima disso, busca primeiro)
+MAX_DROPDOWN = 200
+
+# opções fixas dos selectbox, montadas uma vez no import
+TIPOS: Tuple[str, ...] = tuple(TIPOS_VALIDOS)
+STATUS: Tuple[str, ...] = tuple(STATUS_VALIDOS)
+TIPOS_FILTRO: Tuple[str, ...] = ("(Todos)",) + TIPOS
+STATUS_FILTRO: Tuple[str, ...] = ("(Todos)",) + STATUS
+
+# ações rápidas do editar: (rótulo, key do botão, novo status; None = excluir)
+_QUICK_ACTIONS: Tuple[Tuple[str, str, Optional[str]], ...] = (
+    ("✅ Realizado", "ag_quick_realizado", "Realizado"),
+    ("⛔ Cancelar", "ag_quick_cancelar", "Cancelado"),
+    ("🔁 Reativar", "ag_quick_reativar", "Agendado"),
+    ("🗑️ Excluir definitivamente", "ag_quick_delete", None),
+)
+
+
+class ProcMaps(NamedTuple):
+    ids: Tuple[int, ...]
     label_by_id: Dict[int, str]
 
 
-def _proc_label(p: Processo) -> str:
-    tipo = (p.tipo_acao or "").strip()
-    papel = (p.papel or "").strip()
-    base = f"[{p.id}] {p.numero_processo}"
+# (id, numero_processo, tipo_acao, papel): linha leve, segura para st.cache_data
+ProcRow = Tuple[int, str, Optional[str], Optional[str]]
+
+
+@lru_cache(maxsize=4096)
+def _proc_label_cached(
+    pid: int, numero_processo: str, tipo_acao: Optional[str], papel: Optional[str]
+) -> str:
+    # função pura dos 4 campos: o label sobrevive entre reruns e recargas do cache
+    tipo = (tipo_acao or "").strip()
+    papel = (papel or "").strip()
+    base = f"[{pid}] {numero_processo}"
     if tipo:
         base += f" – {tipo}"
     if papel:
@@ -44,8 +72,12 @@ def _proc_label(p: Processo) -> str:
     return base
 
 
-def _combine_date_time(d: date, t) -> datetime:
-    return datetime(d.year, d.month, d.day, t.hour, t.minute, 0)
+def _proc_label(p: ProcRow) -> str:
+    return _proc_label_cached(*p)
+
+
+def _combine_date_time(d: date, t: time) -> datetime:
+    return datetime.combine(d, t.replace(second=0, microsecond=0))
 
 
 def _sanitize_end_dt(inicio: datetime, fim: datetime) -> Optional[datetime]:
@@ -56,30 +88,80 @@ def _sanitize_end_dt(inicio: datetime, fim: datetime) -> Optional[datetime]:
     return fim
 
 
+def _format_dt_col(values: List[Optional[datetime]]) -> pd.Series:
+    """Formata a coluna inteira de uma vez (strftime do pandas); None => ""."""
+    return (
+        pd.Series(pd.to_datetime(values), copy=False)
+        .dt.strftime("%d/%m/%Y %H:%M")
+        .fillna("")
+    )
+
+
 def _format_dt(dt: Optional[datetime]) -> str:
-    return dt.strftime("%d/%m/%Y %H:%M") if dt else ""
+    # direto dos campos: sem o parse de formato do strftime (até 2x por linha)
+    if dt is None:
+        return ""
+    return f"{dt.day:02d}/{dt.month:02d}/{dt.year:04d} {dt.hour:02d}:{dt.minute:02d}"
 
 
-def _load_processos(owner_user_id: int) -> List[Processo]:
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _load_processos(owner_user_id: int) -> Tuple[ProcRow, ...]:
+    """
+    Cacheado por owner_user_id (ttl=60s): evita um SELECT a cada rerun.
+    Retorna tuplas simples, não objetos ORM (presos à sessão).
+    """
     with get_session() as s:
-        return (
-            s.execute(
-                select(Processo)
-                .where(Processo.owner_user_id == owner_user_id)
-                .order_by(Processo.id.desc())
+        rows = s.execute(
+            select(
+                Processo.id,
+                Processo.numero_processo,
+                Processo.tipo_acao,
+                Processo.papel,
             )
-            .scalars()
-            .all()
-        )
+            .where(Processo.owner_user_id == owner_user_id)
+            .order_by(Processo.id.desc())
+        ).all()
+    return tuple(tuple(r) for r in rows)
+
+
+def clear_processos_cache() -> None:
+    """Invalida a lista cacheada (chamar após criar/editar/excluir trabalhos)."""
+    _load_processos.clear()
+
 
+@st.cache_data(show_spinner=False)
+def _build_proc_maps(processos: Tuple[ProcRow, ...]) -> ProcMaps:
+    """
+    Função pura do conjunto de trabalhos (tupla hashable => chave do cache).
+    Os selectbox recebem os ids e mostram o label via format_func.
+    Uma passada sobre os processos: o dict (ordenado) já dá os ids.
+    """
+    label_by_id = {int(p[0]): _proc_label(p) for p in processos}
+    return ProcMaps(ids=tuple(label_by_id), label_by_id=label_by_id)
 
-def _build_proc_maps(processos: List[Processo]) -> ProcMaps:
-    labels = [_proc_label(p) for p in processos]
-    label_to_id = {_proc_label(p): int(p.id) for p in processos}
-    label_by_id = {int(p.id): _proc_label(p) for p in processos}
-    return ProcMaps(labels=labels, label_to_id=label_to_id, label_by_id=label_by_id)
 
+def _filter_proc_ids(
+    proc_maps: ProcMaps, termo: str, keep: Tuple[Optional[int], ...] = ()
+) -> Tuple[int, ...]:
+    """
+    Até MAX_DROPDOWN ids cujo label contém o termo, mais os já selecionados
+    (em `keep`), para o widget não perder a escolha atual.
+    """
+    labels = proc_maps.label_by_id
+    termo = (termo or "").strip().casefold()
+    matches = (
+        (pid for pid in proc_maps.ids if termo in labels[pid].casefold())
+        if termo
+        else iter(proc_maps.ids)
+    )
+    ids = list(islice(matches, MAX_DROPDOWN))
+    for pid in keep:
+        if pid in labels and pid not in ids:
+            ids.append(pid)
+    return tuple(ids)
 
+
+@st.cache_data(ttl=15, show_spinner=False)
 def _load_agendamentos_for_list(
     owner_user_id: int,
     *,
@@ -89,9 +171,19 @@ def _load_agendamentos_for_list(
     q: Optional[str],
     order: str,
     limit: int,
-):
+    cursor: Optional[Tuple[str, Tuple[datetime, int]]] = None,
+    now_bound: Optional[datetime] = None,
+) -> List[AgendamentoRecord]:
+    """
+    cursor: None (1ª página) | ("after"|"before", (inicio, id)).
+    now_bound: "agora" truncado no minuto (Próximos >= agora; Recentes <= agora);
+    truncar mantém a chave do cache estável entre reruns do mesmo minuto.
+    Cacheado por filtros + cursor (ttl=15s): voltar a um filtro já visto não
+    consulta o banco. Registros simples, não ORM.
+    """
+    direction, key = cursor if cursor else (None, None)
     with get_session() as s:
-        return AgendamentosService.list(
+        return AgendamentosService.list_records(
             s,
             owner_user_id=owner_user_id,
             processo_id=processo_id,
@@ -100,35 +192,76 @@ def _load_agendamentos_for_list(
             q=q,
             order=order,
             limit=limit,
+            after=key if direction == "after" else None,
+            before=key if direction == "before" else None,
+            now_bound=now_bound,
+        )
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def _load_status_counts(
+    owner_user_id: int,
+    *,
+    processo_id: Optional[int],
+    tipo: Optional[str],
+    status: Optional[str],
+    q: Optional[str],
+    order: str,
+    now_bound: Optional[datetime],
+) -> Dict[str, int]:
+    with get_session() as s:
+        return AgendamentosService.status_counts(
+            s,
+            owner_user_id=owner_user_id,
+            processo_id=processo_id,
+            tipo=tipo,
+            status=status,
+            q=q,
+            order=order,
+            now_bound=now_bound,
         )
 
 
-def _load_agendamentos_for_edit_picker(owner_user_id: int, limit: int = 500):
+def clear_agendamentos_cache() -> None:
+    """Invalida lista e KPIs cacheados (chamar após criar/editar/excluir)."""
+    _load_agendamentos_for_list.clear()
+    _load_status_counts.clear()
+    _load_agendamentos_for_edit_picker.clear()
+    _load_agendamento.clear()
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def _load_agendamentos_for_edit_picker(
+    owner_user_id: int, limit: int = 500
+) -> List[AgendamentoPickerItem]:
     """
     O seletor de edição não depende dos filtros da lista.
     Evita o bug: “tenho 2 cadastrados mas no editar só aparece 1”.
     """
     with get_session() as s:
-        return AgendamentosService.list(
-            s,
-            owner_user_id=owner_user_id,
-            processo_id=None,
-            tipo=None,
-            status=None,
-            q=None,
-            order="desc",
-            limit=limit,
-        )
+        return AgendamentosService.list_for_picker(s, owner_user_id, limit=limit)
 
 
-def _build_agendamento_label(a, proc_label_by_id: Dict[int, str]) -> str:
-    proc_lbl = proc_label_by_id.get(a.processo_id, f"[{a.processo_id}]")
+@st.cache_data(ttl=15, show_spinner=False)
+def _load_agendamento(
+    owner_user_id: int, agendamento_id: int
+) -> Optional[AgendamentoRecord]:
+    with get_session() as s:
+        a = AgendamentosService.get(s, owner_user_id, agendamento_id)
+        return AgendamentosService.to_record(a) if a else None
+
+
+@lru_cache(maxsize=2048)
+def _agendamento_label(a: AgendamentoPickerItem, proc_lbl: str) -> str:
+    # registro imutável + label do trabalho => label estável entre reruns
     return f"[#{a.id}] {_format_dt(a.inicio)} — {a.tipo} — {a.status} — {proc_lbl}"
 
 
-def _parse_agendamento_id_from_label(label: str) -> int:
-    head = label.split("]")[0]  # "[#123"
-    return int(head.replace("[#", "").strip())
+def _build_agendamento_label(
+    a: AgendamentoPickerItem, proc_label_by_id: Dict[int, str]
+) -> str:
+    proc_lbl = proc_label_by_id.get(a.processo_id, f"[{a.processo_id}]")
+    return _agendamento_label(a, proc_lbl)
 
 
 def _apply_pref_processo_defaults(proc_maps: ProcMaps) -> None:
@@ -145,52 +278,37 @@ def _apply_pref_processo_defaults(proc_maps: ProcMaps) -> None:
     except Exception:
         return
 
-    pref_label = proc_maps.label_by_id.get(pref_id_int)
-    if not pref_label:
+    if pref_id_int not in proc_maps.label_by_id:
         return
 
-    st.session_state.setdefault("ag_create_proc", pref_label)
-    st.session_state.setdefault("ag_list_filtro_proc", pref_label)
+    st.session_state.setdefault("ag_create_proc", pref_id_int)
+    st.session_state.setdefault("ag_list_filtro_proc", pref_id_int)
 
 
 # -------------------------
-# Page
+# Seções (fragments: cada uma reexecuta sozinha ao interagir com seus widgets)
 # -------------------------
-def render(owner_user_id: int):
-    inject_global_css()
+@st.fragment
+def _render_create(owner_user_id: int, proc_maps: ProcMaps, busca_proc: str) -> None:
+    proc_fmt = proc_maps.label_by_id.__getitem__
+    # hora atual (sem segundos) calculada uma vez: default de início e fim
+    now_t = datetime.now().replace(second=0, microsecond=0).time()
 
-    clicked_refresh = page_header(
-        "Agendamentos",
-        "Cadastro, filtros e controle de compromissos.",
-        right_button_label="Recarregar",
-        right_button_key="ag_btn_recarregar",
-        right_button_help="Recarrega a tela e os dados",
-    )
-    if clicked_refresh:
-        st.rerun()
-
-    processos = _load_processos(owner_user_id)
-    if not processos:
-        st.info("Cadastre um trabalho primeiro para criar agendamentos.")
-        return
-
-    proc_maps = _build_proc_maps(processos)
-    _apply_pref_processo_defaults(proc_maps)
-
-    TIPOS = list(TIPOS_VALIDOS)
-    STATUS = list(STATUS_VALIDOS)
-
-    # =========================================================
-    # CRIAR
-    # =========================================================
     with st.container(border=True):
         st.markdown("#### ➕ Novo agendamento")
         st.caption("Crie um compromisso vinculado a um trabalho.")
 
         with st.form("form_agendamento_create", clear_on_submit=True):
             c1, c2, c3 = st.columns([3, 1, 1])
-            proc_lbl = c1.selectbox(
-                "Trabalho *", proc_maps.labels, key="ag_create_proc"
+            processo_id = c1.selectbox(
+                "Trabalho *",
+                _filter_proc_ids(
+                    proc_maps,
+                    busca_proc,
+                    keep=(st.session_state.get("ag_create_proc"),),
+                ),
+                format_func=proc_fmt,
+                key="ag_create_proc",
             )
             tipo = c2.selectbox("Tipo *", TIPOS, key="ag_create_tipo")
             status = c3.selectbox("Status *", STATUS, index=0, key="ag_create_status")
@@ -201,7 +319,7 @@ def render(owner_user_id: int):
             )
             h_ini = c5.time_input(
                 "Hora início *",
-                value=datetime.now().replace(second=0, microsecond=0).time(),
+                value=now_t,
                 key="ag_create_hini",
             )
 
@@ -211,7 +329,7 @@ def render(owner_user_id: int):
             )
             h_fim = c7.time_input(
                 "Hora fim (opcional)",
-                value=datetime.now().replace(second=0, microsecond=0).time(),
+                value=now_t,
                 key="ag_create_hfim",
             )
 
@@ -224,7 +342,8 @@ def render(owner_user_id: int):
 
         if submitted:
             try:
-                processo_id = int(proc_maps.label_to_id[proc_lbl])
+                if processo_id is None:
+                    raise ValueError("Selecione um trabalho.")
                 inicio = _combine_date_time(d_ini, h_ini)
                 fim = _combine_date_time(d_fim, h_fim)
                 fim_val = _sanitize_end_dt(inicio, fim)
@@ -245,85 +364,97 @@ def render(owner_user_id: int):
                     )
 
                 st.success("Agendamento criado.")
+                clear_agendamentos_cache()
                 st.rerun()
             except Exception as e:
                 st.error(f"Erro ao criar agendamento: {e}")
 
-    st.write("")
 
-    # =========================================================
-    # LISTA (filtros)
-    # =========================================================
+@st.fragment
+def _render_list(owner_user_id: int, proc_maps: ProcMaps, busca_proc: str) -> None:
+    proc_fmt = proc_maps.label_by_id.__getitem__
+
     with st.container(border=True):
         st.markdown("#### 📋 Lista")
         st.caption("Filtre e visualize rapidamente.")
 
-        cF1, cF2, cF3, cF4 = st.columns([3, 2, 2, 1])
-        filtro_proc = cF1.selectbox(
-            "Trabalho",
-            ["(Todos)"] + proc_maps.labels,
-            index=0,
-            key="ag_list_filtro_proc",
-        )
-        filtro_tipo = cF2.selectbox(
-            "Tipo",
-            ["(Todos)"] + TIPOS,
-            index=0,
-            key="ag_list_filtro_tipo",
-        )
-        filtro_status = cF3.selectbox(
-            "Status",
-            ["(Todos)"] + STATUS,
-            index=0,
-            key="ag_list_filtro_status",
-        )
-        filtro_limit = cF4.selectbox(
-            "Limite", [100, 200, 300, 500], index=1, key="ag_list_limit"
-        )
+        # form: os filtros só disparam a consulta ao aplicar (não a cada tecla);
+        # até lá, os últimos valores aplicados continuam no session_state
+        with st.form("form_ag_list_filters"):
+            cF1, cF2, cF3, cF4 = st.columns([3, 2, 2, 1])
+            processo_id = cF1.selectbox(
+                "Trabalho",
+                (None,)
+                + _filter_proc_ids(
+                    proc_maps,
+                    busca_proc,
+                    keep=(st.session_state.get("ag_list_filtro_proc"),),
+                ),
+                format_func=lambda pid: "(Todos)" if pid is None else proc_fmt(pid),
+                index=0,
+                key="ag_list_filtro_proc",
+            )
+            filtro_tipo = cF2.selectbox(
+                "Tipo",
+                TIPOS_FILTRO,
+                index=0,
+                key="ag_list_filtro_tipo",
+            )
+            filtro_status = cF3.selectbox(
+                "Status",
+                STATUS_FILTRO,
+                index=0,
+                key="ag_list_filtro_status",
+            )
+            filtro_limit = cF4.selectbox(
+                "Limite", [100, 200, 300, 500], index=1, key="ag_list_limit"
+            )
 
-        cO1, cO2 = st.columns([1, 3])
-        order = cO1.radio(
-            "Ordem", ["Próximos", "Recentes"], horizontal=True, key="ag_list_order"
-        )
-        filtro_q = cO2.text_input(
-            "Buscar (local/descrição)", value="", key="ag_list_busca"
-        )
+            cO1, cO2 = st.columns([1, 3])
+            order = cO1.radio(
+                "Ordem", ["Próximos", "Recentes"], horizontal=True, key="ag_list_order"
+            )
+            filtro_q = cO2.text_input(
+                "Buscar (local/descrição)", value="", key="ag_list_busca"
+            )
+            applied = st.form_submit_button(
+                "Aplicar filtros", use_container_width=True
+            )
 
-        order_val = "asc" if order == "Próximos" else "desc"
+        # filtros novos => volta para a primeira página
+        if applied:
+            st.session_state["ag_list_cursor"] = None
+            st.session_state["ag_list_page"] = 0
+        page = int(st.session_state.get("ag_list_page", 0))
 
-        processo_id = None
-        if filtro_proc != "(Todos)":
-            processo_id = int(proc_maps.label_to_id[filtro_proc])
+        order_val = "asc" if order == "Próximos" else "desc"
 
         tipo_val = None if filtro_tipo == "(Todos)" else filtro_tipo
         status_val = None if filtro_status == "(Todos)" else filtro_status
         q_val = (filtro_q or "").strip() or None
+        # horário de SP sem tz, como `inicio` é gravado (e como o painel compara);
+        # datetime.now() seria o relógio do servidor. Mesmo corte p/ KPIs e lista
+        now_bound = now_br().replace(tzinfo=None, second=0, microsecond=0)
 
-        ags = _load_agendamentos_for_list(
+        # KPIs rápidos (padrão painel) — GROUP BY status no banco, sem puxar linhas;
+        # mesma janela da lista (próximos/recentes), não todos os agendamentos
+        counts = _load_status_counts(
             owner_user_id,
             processo_id=processo_id,
             tipo=tipo_val,
             status=status_val,
             q=q_val,
             order=order_val,
-            limit=int(filtro_limit),
-        )
-
-        # KPIs rápidos (padrão painel)
-        total = len(ags or [])
-        agendados = sum(
-            1 for a in (ags or []) if (a.status or "").lower() == "agendado"
-        )
-        realizados = sum(
-            1 for a in (ags or []) if (a.status or "").lower() == "realizado"
-        )
-        cancelados = sum(
-            1 for a in (ags or []) if (a.status or "").lower() == "cancelado"
+            now_bound=now_bound,
         )
+        total = sum(counts.values())
+        agendados = counts.get("Agendado", 0)
+        realizados = counts.get("Realizado", 0)
+        cancelados = counts.get("Cancelado", 0)
 
         k1, k2, k3, k4 = st.columns(4)
         with k1:
-            card("Total", f"{total}", "nos filtros", tone="info")
+            card("Total", f"{total}", f"{order.lower()} nos filtros", tone="info")
         with k2:
             card(
                 "Agendados",
@@ -342,33 +473,101 @@ def render(owner_user_id: int):
             )
 
         st.write("")
-        if ags:
-            df = pd.DataFrame(
-                [
-                    {
-                        "id": a.id,
-                        "trabalho": proc_maps.label_by_id.get(
-                            a.processo_id, f"[{a.processo_id}]"
-                        ),
-                        "status": a.status,
-                        "tipo": a.tipo,
-                        "início": _format_dt(a.inicio),
-                        "fim": _format_dt(a.fim),
-                        "local": a.local or "",
-                        "descrição": a.descricao or "",
-                    }
-                    for a in ags
-                ]
+        # linhas só quando o usuário abre a lista (os KPIs não dependem delas)
+        if st.toggle("Ver lista", key="ag_list_show"):
+            cursor = st.session_state.get("ag_list_cursor")
+            # limit + 1: a linha extra só diz se existe página seguinte (sem
+            # habilitar "Próxima" quando sobram exatamente `limit` linhas)
+            ags = _load_agendamentos_for_list(
+                owner_user_id,
+                processo_id=processo_id,
+                tipo=tipo_val,
+                status=status_val,
+                q=q_val,
+                order=order_val,
+                limit=filtro_limit + 1,
+                cursor=cursor,
+                now_bound=now_bound,
             )
-            st.dataframe(df, use_container_width=True, hide_index=True, height=420)
-        else:
-            st.info("Nenhum agendamento encontrado com os filtros atuais.")
-
-    st.write("")
+            if cursor and cursor[0] == "before":
+                # voltando: a extra é a mais distante (vem no início); e a página
+                # de onde viemos existe, então há "próxima" se veio alguma linha
+                ags = ags[-filtro_limit:]
+                has_next = bool(ags)
+            else:
+                has_next = len(ags) > filtro_limit
+                ags = ags[:filtro_limit]
+
+            if ags:
+                # colunar (dict de listas): uma passada, sem lista de dicts p/ transpor
+                ids, trabs, stats, tipos, inis, fims, locs, descs = (
+                    [] for _ in range(8)
+                )
+                get_label = proc_maps.label_by_id.get
+                for a in ags:
+                    ids.append(a.id)
+                    trabs.append(get_label(a.processo_id, f"[{a.processo_id}]"))
+                    stats.append(a.status)
+                    tipos.append(a.tipo)
+                    inis.append(a.inicio)
+                    fims.append(a.fim)
+                    locs.append(a.local or "")
+                    descs.append(a.descricao or "")
+
+                df = pd.DataFrame(
+                    {
+                        "id": ids,
+                        "trabalho": trabs,
+                        "status": stats,
+                        "tipo": tipos,
+                        # datas formatadas por coluna (vetorizado), não por linha
+                        "início": _format_dt_col(inis),
+                        "fim": _format_dt_col(fims),
+                        "local": locs,
+                        "descrição": descs,
+                    },
+                    copy=False,
+                )
+                st.dataframe(df, use_container_width=True, hide_index=True, height=420)
+            else:
+                st.info("Nenhum agendamento encontrado com os filtros atuais.")
+
+            # paginação por cursor (inicio, id) da primeira/última linha da página
+            cP1, cP2, cP3 = st.columns([1, 2, 1], vertical_alignment="center")
+            if cP1.button(
+                "◀ Anterior",
+                key="ag_list_prev",
+                disabled=page == 0,
+                use_container_width=True,
+            ):
+                if page <= 1 or not ags:
+                    st.session_state["ag_list_cursor"] = None
+                    st.session_state["ag_list_page"] = 0
+                else:
+                    first = ags[0]
+                    st.session_state["ag_list_cursor"] = (
+                        "before",
+                        (first.inicio, first.id),
+                    )
+                    st.session_state["ag_list_page"] = page - 1
+                st.rerun(scope="fragment")
+            cP2.caption(f"Página {page + 1}")
+            if cP3.button(
+                "Próxima página ▶",
+                key="ag_list_next",
+                disabled=not has_next,
+                use_container_width=True,
+            ):
+                last = ags[-1]
+                st.session_state["ag_list_cursor"] = ("after", (last.inicio, last.id))
+                st.session_state["ag_list_page"] = page + 1
+                st.rerun(scope="fragment")
+
+
+@st.fragment
+def _render_edit(owner_user_id: int, proc_maps: ProcMaps, busca_proc: str) -> None:
+    proc_fmt = proc_maps.label_by_id.__getitem__
 
-    # =========================================================
-    # EDITAR / EXCLUIR (seletor independente)
-    # =========================================================
     with st.container(border=True):
         st.markdown("#### ✏️ Editar / 🗑️ Excluir")
         st.caption(
@@ -379,96 +578,71 @@ def render(owner_user_id: int):
         if not ags_for_edit:
             st.info("Nenhum agendamento cadastrado.")
             return
+        ags_by_id = {a.id: a for a in ags_for_edit}
 
-        edit_labels = [
-            _build_agendamento_label(a, proc_maps.label_by_id) for a in ags_for_edit
-        ]
-
-        st.session_state.setdefault("ag_edit_selected", edit_labels[0])
+        # a escolha fica no próprio widget (key): sem varrer a lista atrás do índice;
+        # se o id saiu da lista (excluído), volta para o primeiro
+        if st.session_state.get("ag_edit_picker") not in ags_by_id:
+            st.session_state.pop("ag_edit_picker", None)
 
-        selected_label = st.selectbox(
+        # opções = ids; o label só é montado para exibição (memoizado)
+        agendamento_id = st.selectbox(
             "Selecione um agendamento",
-            options=edit_labels,
-            index=(
-                edit_labels.index(st.session_state.ag_edit_selected)
-                if st.session_state.ag_edit_selected in edit_labels
-                else 0
+            options=tuple(ags_by_id),
+            format_func=lambda aid: _build_agendamento_label(
+                ags_by_id[aid], proc_maps.label_by_id
             ),
             key="ag_edit_picker",
         )
-        st.session_state.ag_edit_selected = selected_label
-        agendamento_id = _parse_agendamento_id_from_label(selected_label)
 
-        # buscar agendamento
-        with get_session() as s:
-            a = AgendamentosService.get(s, owner_user_id, int(agendamento_id))
+        # o seletor só traz as colunas do label; a linha completa (local/descrição)
+        # vem de uma consulta por id, cacheada
+        a = _load_agendamento(owner_user_id, agendamento_id)
         if not a:
             st.error("Agendamento não encontrado.")
             return
 
-        # Ações rápidas (fora do form)
+        # Ações rápidas (fora do form): no máximo um clique por rerun,
+        # despachado numa única sessão
         st.caption("⚡ Ações rápidas (no agendamento selecionado)")
-        cA, cB, cC, cD = st.columns([1, 1, 1, 1.2], vertical_alignment="center")
-
-        if cA.button(
-            "✅ Realizado", key="ag_quick_realizado", use_container_width=True
-        ):
-            try:
-                with get_session() as s:
-                    AgendamentosService.set_status(
-                        s, owner_user_id, int(agendamento_id), "Realizado"
-                    )
-                st.success("Agendamento marcado como Realizado.")
-                st.rerun()
-            except Exception as e:
-                st.error(str(e))
-
-        if cB.button("⛔ Cancelar", key="ag_quick_cancelar", use_container_width=True):
-            try:
-                with get_session() as s:
-                    AgendamentosService.set_status(
-                        s, owner_user_id, int(agendamento_id), "Cancelado"
-                    )
-                st.warning("Agendamento cancelado.")
-                st.rerun()
-            except Exception as e:
-                st.error(str(e))
+        cols = st.columns([1, 1, 1, 1.2], vertical_alignment="center")
 
-        if cC.button("🔁 Reativar", key="ag_quick_reativar", use_container_width=True):
+        action = novo_status = None
+        for col, (rotulo, key, stt) in zip(cols, _QUICK_ACTIONS):
+            if col.button(rotulo, key=key, use_container_width=True):
+                action, novo_status = key, stt
+        if action is not None:
             try:
                 with get_session() as s:
-                    AgendamentosService.set_status(
-                        s, owner_user_id, int(agendamento_id), "Agendado"
-                    )
-                st.success("Agendamento reativado (Agendado).")
+                    if novo_status is None:
+                        AgendamentosService.delete(s, owner_user_id, agendamento_id)
+                    else:
+                        AgendamentosService.set_status(
+                            s, owner_user_id, agendamento_id, novo_status
+                        )
+                clear_agendamentos_cache()
                 st.rerun()
             except Exception as e:
-                st.error(str(e))
-
-        if cD.button(
-            "🗑️ Excluir definitivamente", key="ag_quick_delete", use_container_width=True
-        ):
-            try:
-                with get_session() as s:
-                    AgendamentosService.delete(s, owner_user_id, int(agendamento_id))
-                st.warning("Agendamento excluído.")
-                st.rerun()
-            except Exception as e:
-                st.error(f"Erro ao excluir: {e}")
+                st.error(f"Erro na ação rápida: {e}")
 
         st.divider()
 
-        proc_atual_lbl = proc_maps.label_by_id.get(a.processo_id, proc_maps.labels[0])
+        proc_ids_e = _filter_proc_ids(
+            proc_maps,
+            busca_proc,
+            keep=(a.processo_id, st.session_state.get("ag_edit_proc")),
+        )
 
         # Form edição (somente salvar aqui)
         with st.form("form_agendamento_edit"):
             c1, c2, c3 = st.columns([3, 1, 1])
-            proc_lbl_e = c1.selectbox(
+            processo_id_e = c1.selectbox(
                 "Trabalho",
-                proc_maps.labels,
+                proc_ids_e,
+                format_func=proc_fmt,
                 index=(
-                    proc_maps.labels.index(proc_atual_lbl)
-                    if proc_atual_lbl in proc_maps.labels
+                    proc_ids_e.index(a.processo_id)
+                    if a.processo_id in proc_maps.label_by_id
                     else 0
                 ),
                 key="ag_edit_proc",
@@ -486,22 +660,18 @@ def render(owner_user_id: int):
                 key="ag_edit_status",
             )
 
+            # início (data e hora sem segundos) extraído uma vez: default do fim também
+            inicio_d = a.inicio.date()
+            inicio_t = a.inicio.time().replace(second=0, microsecond=0)
+
             c4, c5 = st.columns(2)
-            d_ini_e = c4.date_input(
-                "Data início", value=a.inicio.date(), key="ag_edit_dini"
-            )
-            h_ini_e = c5.time_input(
-                "Hora início",
-                value=a.inicio.time().replace(second=0, microsecond=0),
-                key="ag_edit_hini",
-            )
+            d_ini_e = c4.date_input("Data início", value=inicio_d, key="ag_edit_dini")
+            h_ini_e = c5.time_input("Hora início", value=inicio_t, key="ag_edit_hini")
 
             fim_dt = a.fim
-            d_fim_default = fim_dt.date() if fim_dt else a.inicio.date()
+            d_fim_default = fim_dt.date() if fim_dt else inicio_d
             h_fim_default = (
-                fim_dt.time().replace(second=0, microsecond=0)
-                if fim_dt
-                else a.inicio.time().replace(second=0, microsecond=0)
+                fim_dt.time().replace(second=0, microsecond=0) if fim_dt else inicio_t
             )
 
             c6, c7 = st.columns(2)
@@ -519,8 +689,6 @@ def render(owner_user_id: int):
 
         if atualizar:
             try:
-                processo_id_e = int(proc_maps.label_to_id[proc_lbl_e])
-
                 inicio_e = _combine_date_time(d_ini_e, h_ini_e)
                 fim_e = _combine_date_time(d_fim_e, h_fim_e)
                 fim_val = _sanitize_end_dt(inicio_e, fim_e)
@@ -529,7 +697,7 @@ def render(owner_user_id: int):
                     AgendamentosService.update(
                         s,
                         owner_user_id,
-                        int(agendamento_id),
+                        agendamento_id,
                         AgendamentoUpdate(
                             processo_id=processo_id_e,
                             tipo=tipo_e,
@@ -542,7 +710,54 @@ def render(owner_user_id: int):
                     )
 
                 st.success("Agendamento atualizado.")
+                clear_agendamentos_cache()
                 st.rerun()
 
             except Exception as e:
                 st.error(f"Erro ao atualizar: {e}")
+
+
+# -------------------------
+# Page
+# -------------------------
+def render(owner_user_id: int):
+    inject_global_css()
+
+    clicked_refresh = page_header(
+        "Agendamentos",
+        "Cadastro, filtros e controle de compromissos.",
+        right_button_label="Recarregar",
+        right_button_key="ag_btn_recarregar",
+        right_button_help="Recarrega a tela e os dados",
+    )
+    if clicked_refresh:
+        clear_processos_cache()
+        clear_agendamentos_cache()
+        st.rerun()
+
+    processos = _load_processos(owner_user_id)
+    if not processos:
+        st.info("Cadastre um trabalho primeiro para criar agendamentos.")
+        return
+
+    proc_maps = _build_proc_maps(processos)
+    _apply_pref_processo_defaults(proc_maps)
+
+    # muitos trabalhos: filtra antes de montar os selectbox (render O(MAX_DROPDOWN))
+    busca_proc = ""
+    if len(proc_maps.ids) > MAX_DROPDOWN:
+        busca_proc = st.text_input(
+            "Buscar trabalho",
+            key="ag_proc_busca",
+            placeholder="nº do processo, tipo de ação ou papel",
+        )
+        st.caption(
+            f"{len(proc_maps.ids)} trabalhos: as listas mostram até "
+            f"{MAX_DROPDOWN} por vez. Refine a busca para achar os demais."
+        )
+
+    _render_create(owner_user_id, proc_maps, busca_proc)
+    st.write("")
+    _render_list(owner_user_id, proc_maps, busca_proc)
+    st.write("")
+    _render_edit(owner_user_id, proc_maps, busca_proc)
@@ -1,44 +1,171 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, time
+from functools import lru_cache
+from typing import Optional
 
 from sqlalchemy import select
 
 from db.connection import get_session
 from db.models import Processo
-from core.andamentos_service import AndamentosService, AndamentoCreate, AndamentoUpdate
+from core.andamentos_service import (
+    AndamentoRecord,
+    AndamentosService,
+    AndamentoCreate,
+    AndamentoUpdate,
+)
 
 
-def _proc_label(p: Processo) -> str:
-    tipo = (p.tipo_acao or "").strip()
-    if tipo:
-        return f"[{p.id}] {p.numero_processo} – {tipo}"
-    return f"[{p.id}] {p.numero_processo}"
+# teto de opções no seletor de edição (o resto via filtro de texto)
+MAX_EDIT_OPTIONS = 50
 
+# (id, numero_processo, tipo_acao): linha leve, segura para st.cache_data
+ProcRow = tuple[int, str, Optional[str]]
 
-def _and_label(a, proc_label_by_id: dict[int, str]) -> str:
+
+def _clean(s: Optional[str]) -> Optional[str]:
+    """Texto sem espaços nas pontas; vazio vira None."""
+    return (s or "").strip() or None
+
+
+@lru_cache(maxsize=4096)
+def _proc_label_cached(pid: int, numero_processo: str, tipo_acao: Optional[str]) -> str:
+    # função pura dos campos: o label sobrevive entre reruns e recargas do cache;
+    # tipo_acao já vem limpo de _load_processos_rows
+    if tipo_acao:
+        return f"[{pid}] {numero_processo} – {tipo_acao}"
+    return f"[{pid}] {numero_processo}"
+
+
+def _proc_label(p: ProcRow) -> str:
+    return _proc_label_cached(*p)
+
+
+def _combine_date_time(d: date, t: time) -> datetime:
+    return datetime.combine(d, t.replace(second=0, microsecond=0))
+
+
+def _and_label(a, dt: str, proc_label_by_id: dict[int, str]) -> str:
+    """dt: data_evento já formatada (em lote, ver _section_edit_delete)."""
     proc = proc_label_by_id.get(a.processo_id, f"[{a.processo_id}]")
-    dt = a.data_evento.strftime("%d/%m/%Y %H:%M")
     titulo = (a.titulo or "").strip()
     return f"{dt} | {proc} | {titulo}"
 
 
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _load_processos_rows(owner_user_id: int) -> tuple[ProcRow, ...]:
+    """
+    Cacheado por owner_user_id (ttl=60s): evita um SELECT a cada rerun.
+    Só as colunas do label, em tuplas (objetos ORM não vão para o cache);
+    tipo_acao é limpo aqui, uma vez por carga, e não a cada label.
+    """
+    with get_session() as s:
+        rows = s.execute(
+            select(Processo.id, Processo.numero_processo, Processo.tipo_acao)
+            .where(Processo.owner_user_id == owner_user_id)
+            .order_by(Processo.id.desc())
+        ).all()
+    return tuple((pid, numero, _clean(tipo)) for pid, numero, tipo in rows)
+
+
+def clear_processos_cache() -> None:
+    """Invalida a lista cacheada (chamar após criar/editar/excluir trabalhos)."""
+    _load_processos_rows.clear()
+    _build_and_labels.clear()
+
+
+@st.cache_data(show_spinner=False)
+def _build_proc_maps(
+    processos: tuple[ProcRow, ...],
+) -> tuple[list[str], dict[str, int], dict[int, str], dict[str, int]]:
+    """
+    Função pura do conjunto de processos (tupla hashable => chave do cache).
+    Uma passada: cada label é montado uma única vez e vai para as quatro estruturas
+    (a última é a posição do label em `labels`, para o `index` dos selectboxes).
+    """
+    labels: list[str] = []
+    label_to_id: dict[str, int] = {}
+    label_by_id: dict[int, str] = {}
+    label_index: dict[str, int] = {}
+    for i, p in enumerate(processos):
+        pid = p[0]
+        lbl = _proc_label(p)
+        labels.append(lbl)
+        label_to_id[lbl] = pid
+        label_by_id[pid] = lbl
+        label_index.setdefault(lbl, i)
+    return labels, label_to_id, label_by_id, label_index
+
+
 def _load_processos(owner_user_id: int):
+    processos = _load_processos_rows(owner_user_id)
+    proc_labels, proc_label_to_id, proc_label_by_id, proc_label_index = (
+        _build_proc_maps(processos)
+    )
+    return (
+        processos,
+        proc_labels,
+        proc_label_to_id,
+        proc_label_by_id,
+        proc_label_index,
+    )
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _list_andamentos_cached(
+    owner_user_id: int,
+    processo_id: Optional[int],
+    q: Optional[str],
+    limit: int,
+    offset: int = 0,
+) -> list[AndamentoRecord]:
+    """
+    Cacheado pelos filtros + página (ttl=30s): reruns que não mudam os filtros
+    (ex.: o toggle "Usar hora" do editar) não refazem o SELECT. Registros
+    simples, não ORM.
+    """
     with get_session() as s:
-        processos = (
-            s.execute(
-                select(Processo)
-                .where(Processo.owner_user_id == owner_user_id)
-                .order_by(Processo.id.desc())
-            )
-            .scalars()
-            .all()
+        return AndamentosService.list_records(
+            s,
+            owner_user_id=owner_user_id,
+            processo_id=processo_id,
+            q=q,
+            limit=limit,
+            offset=offset,
         )
 
-    proc_labels = [_proc_label(p) for p in processos]
-    proc_label_to_id = {_proc_label(p): p.id for p in processos}
-    proc_label_by_id = {p.id: _proc_label(p) for p in processos}
-    return processos, proc_labels, proc_label_to_id, proc_label_by_id
+
+def clear_andamentos_cache() -> None:
+    """Invalida a lista cacheada (chamar após criar/editar/excluir)."""
+    _list_andamentos_cached.clear()
+    _build_and_labels.clear()
+
+
+@st.cache_data(ttl=30, max_entries=32, show_spinner=False)
+def _build_and_labels(
+    owner_user_id: int,
+    processo_id: Optional[int],
+    q: Optional[str],
+    page_size: int,
+    offset: int = 0,
+) -> tuple[list[int], list[str]]:
+    """
+    Listas alinhadas (ids, labels) do seletor de edição para a página listada.
+    Chave = os mesmos escalares da lista (barata de hashear, ao contrário dos
+    registros); estes vêm da mesma entrada de _list_andamentos_cached.
+    """
+    andamentos = _list_andamentos_cached(
+        owner_user_id, processo_id, q, page_size + 1, offset=offset
+    )[:page_size]
+    proc_label_by_id = _load_processos(owner_user_id)[3]
+
+    # datas formatadas de uma vez (strftime vetorizado), não uma por label
+    dt_strs = pd.to_datetime([a.data_evento for a in andamentos]).strftime(
+        "%d/%m/%Y %H:%M"
+    )
+    ids = [a.id for a in andamentos]
+    labels = [_and_label(a, dt, proc_label_by_id) for a, dt in zip(andamentos, dt_strs)]
+    return ids, labels
 
 
 def _section_create(
@@ -73,29 +200,30 @@ def _section_create(
             return
 
         # ---------- validações ----------
-        titulo_ok = bool((titulo or "").strip())
-        if not titulo_ok:
+        titulo = _clean(titulo)
+        if not titulo:
             st.error("Informe o **Título**.")
             return
 
         try:
-            processo_id = int(proc_label_to_id[proc_lbl])
+            processo_id = proc_label_to_id[proc_lbl]
 
             # se hora não for usada, fixa 00:00 (ou você pode preferir 12:00)
             hhmm = hora if hora is not None else time(0, 0)
-            dt_evento = datetime(d.year, d.month, d.day, hhmm.hour, hhmm.minute, 0)
+            dt_evento = _combine_date_time(d, hhmm)
 
             payload = AndamentoCreate(
                 processo_id=processo_id,
                 data_evento=dt_evento,
-                titulo=titulo.strip(),
-                descricao=(descricao or "").strip() or None,
+                titulo=titulo,
+                descricao=_clean(descricao),
             )
 
             with get_session() as s:
                 AndamentosService.create(s, owner_user_id, payload)
 
             st.success("Andamento criado.")
+            clear_andamentos_cache()
             st.rerun()
 
         except Exception as e:
@@ -110,70 +238,139 @@ def _section_list(
 ):
     st.subheader("📋 Lista")
 
-    cF1, cF2, cF3 = st.columns([3, 2, 1])
-    filtro_proc = cF1.selectbox(
-        "Filtrar por processo",
-        ["(Todos)"] + proc_labels,
-        index=0,
-        key="and_list_filtro_proc",
-    )
-    filtro_q = cF2.text_input("Buscar texto", value="", key="and_list_busca")
-    filtro_limit = cF3.selectbox(
-        "Limite", [100, 200, 300, 500], index=1, key="and_list_limit"
-    )
+    # form: a busca só consulta ao aplicar (não a cada tecla); até lá,
+    # os últimos valores aplicados continuam no session_state
+    with st.form("form_and_list_filters"):
+        cF1, cF2, cF3 = st.columns([3, 2, 1])
+        filtro_proc = cF1.selectbox(
+            "Filtrar por processo",
+            ["(Todos)"] + proc_labels,
+            index=0,
+            key="and_list_filtro_proc",
+        )
+        filtro_q = cF2.text_input("Buscar texto", value="", key="and_list_busca")
+        filtro_limit = cF3.selectbox(
+            "Por página", [100, 200, 300, 500], index=1, key="and_list_limit"
+        )
+        applied = st.form_submit_button("Aplicar filtros")
+
+    # filtros novos => volta para a primeira página
+    if applied:
+        st.session_state["and_list_page"] = 0
+    page = st.session_state.get("and_list_page", 0)
+    page_size = filtro_limit
 
     processo_id = None
     if filtro_proc != "(Todos)":
-        processo_id = int(proc_label_to_id[filtro_proc])
-
-    with get_session() as s:
-        andamentos = AndamentosService.list(
-            s,
-            owner_user_id=owner_user_id,
-            processo_id=processo_id,
-            q=(filtro_q or None),
-            limit=int(filtro_limit),
-        )
+        processo_id = proc_label_to_id[filtro_proc]
+
+    # paginação no SQL (LIMIT/OFFSET): só a página atual sai do banco e vai ao
+    # navegador; 1 linha a mais só para saber se existe próxima página
+    q = filtro_q or None
+    offset = page * page_size
+    andamentos = _list_andamentos_cached(
+        owner_user_id, processo_id, q, page_size + 1, offset=offset
+    )
+    # mesmos escalares viram a chave dos labels do seletor (ver _build_and_labels)
+    filtros = (processo_id, q, page_size, offset)
+    has_next = len(andamentos) > page_size
+    andamentos = andamentos[:page_size]
 
-    if not andamentos:
+    if not andamentos and page == 0:
         st.info("Nenhum andamento cadastrado.")
-        return [], pd.DataFrame()
-
-    df = pd.DataFrame(
-        [
-            {
-                "id": a.id,
-                "processo": proc_label_by_id.get(a.processo_id, f"[{a.processo_id}]"),
-                "data_evento": a.data_evento.strftime("%d/%m/%Y %H:%M"),
-                "titulo": a.titulo,
-                "descricao": a.descricao or "",
-            }
-            for a in andamentos
-        ]
-    )
+        return [], pd.DataFrame(), filtros
 
-    st.dataframe(df, use_container_width=True, hide_index=True)
-    return andamentos, df
+    # registros (NamedTuple) direto para o DataFrame; formatação por coluna
+    # (vetorizada no pandas), sem laço Python por linha
+    df = pd.DataFrame.from_records(andamentos, columns=AndamentoRecord._fields)
+    pids = df["processo_id"]
+    df["processo"] = pids.map(proc_label_by_id).fillna("[" + pids.astype(str) + "]")
+    df["data_evento"] = pd.to_datetime(df["data_evento"]).dt.strftime("%d/%m/%Y %H:%M")
+    df["descricao"] = df["descricao"].fillna("")
+    df = df[["id", "processo", "data_evento", "titulo", "descricao"]]
 
+    st.dataframe(df, use_container_width=True, hide_index=True)
 
+    cP1, cP2, cP3 = st.columns([1, 2, 1], vertical_alignment="center")
+    if cP1.button(
+        "◀ Anterior", key="and_list_prev", disabled=page == 0, use_container_width=True
+    ):
+        st.session_state["and_list_page"] = page - 1
+        st.rerun()
+    cP2.caption(f"Página {page + 1}")
+    if cP3.button(
+        "Próxima página ▶",
+        key="and_list_next",
+        disabled=not has_next,
+        use_container_width=True,
+    ):
+        st.session_state["and_list_page"] = page + 1
+        st.rerun()
+
+    return andamentos, df, filtros
+
+
+# fragment: o seletor e a confirmação de exclusão reexecutam só esta seção
+# (sem recarregar processos nem refazer a lista); os args vêm do último run
+# completo, e salvar/excluir chamam st.rerun() para atualizar a página toda
+@st.fragment
 def _section_edit_delete(
     owner_user_id: int,
     andamentos: list,
+    filtros: tuple,
     proc_labels: list[str],
     proc_label_to_id: dict[str, int],
     proc_label_by_id: dict[int, str],
+    proc_label_index: dict[str, int],
 ):
     st.subheader("✏️ Editar / 🗑️ Excluir")
 
-    # dropdown amigável (em vez de "ID seco")
-    options = {_and_label(a, proc_label_by_id): a.id for a in andamentos}
-    sel_label = st.selectbox(
-        "Selecione o andamento", list(options.keys()), key="and_edit_select"
+    # lazy: labels, filtro e formulário só quando o usuário pede para editar
+    # (expander executaria o corpo mesmo fechado; o toggle reexecuta só o fragment)
+    if not st.toggle("Editar um andamento", key="and_edit_show"):
+        return
+
+    # dropdown amigável (em vez de "ID seco"): opções = ids, label só na exibição;
+    # Series indexada por id => labels repetidos (mesma data/título) não colidem
+    ids, all_labels = _build_and_labels(owner_user_id, *filtros)
+    id_to_label = pd.Series(all_labels, index=ids)
+
+    # janela: filtra os labels (vetorizado) e manda no máximo MAX_EDIT_OPTIONS
+    # para o navegador, mantendo o selecionado atual entre as opções
+    termo = st.text_input(
+        "Filtrar andamentos",
+        key="and_edit_filtro",
+        placeholder="data, processo ou título",
+    ).strip()
+    labels = id_to_label
+    if termo:
+        labels = labels[labels.str.contains(termo, case=False, regex=False)]
+    option_ids = labels.index[:MAX_EDIT_OPTIONS].tolist()
+    selected = st.session_state.get("and_edit_select")
+    if selected in id_to_label.index and selected not in option_ids:
+        option_ids.append(selected)
+    if not option_ids:
+        st.info("Nenhum andamento corresponde ao filtro.")
+        return
+    if len(labels) > MAX_EDIT_OPTIONS:
+        st.caption(
+            f"Mostrando {MAX_EDIT_OPTIONS} de {len(labels)}. Refine o filtro acima."
+        )
+
+    andamento_id = st.selectbox(
+        "Selecione o andamento",
+        option_ids,
+        format_func=id_to_label.__getitem__,
+        key="and_edit_select",
     )
-    andamento_id = int(options[sel_label])
 
-    with get_session() as s:
-        a = AndamentosService.get(s, owner_user_id, andamento_id)
+    # reaproveita a linha já carregada na lista (mesma posição de `ids`);
+    # só consulta se faltar ou se os caches (ttl) tiverem divergido
+    pos = id_to_label.index.get_indexer([andamento_id])[0]
+    a = andamentos[pos] if 0 <= pos < len(andamentos) else None
+    if a is None or a.id != andamento_id:
+        with get_session() as s:
+            a = AndamentosService.get(s, owner_user_id, andamento_id)
 
     if not a:
         st.error("Andamento não encontrado.")
@@ -187,11 +384,7 @@ def _section_edit_delete(
         proc_lbl_e = c1.selectbox(
             "Processo",
             proc_labels,
-            index=(
-                proc_labels.index(proc_atual_lbl)
-                if proc_atual_lbl in proc_labels
-                else 0
-            ),
+            index=proc_label_index.get(proc_atual_lbl, 0),
             key=f"and_edit_proc_{andamento_id}",
         )
 
@@ -225,42 +418,51 @@ def _section_edit_delete(
 
     # -------- atualizar --------
     if atualizar:
-        if not (titulo_e or "").strip():
+        titulo_e = _clean(titulo_e)
+        if not titulo_e:
             st.error("Informe o **Título**.")
             return
 
         try:
-            processo_id_e = int(proc_label_to_id[proc_lbl_e])
+            processo_id_e = proc_label_to_id[proc_lbl_e]
 
             hhmm = hora_e if hora_e is not None else time(0, 0)
-            dt_evento_e = datetime(
-                d_e.year, d_e.month, d_e.day, hhmm.hour, hhmm.minute, 0
-            )
+            dt_evento_e = _combine_date_time(d_e, hhmm)
 
             payload = AndamentoUpdate(
                 processo_id=processo_id_e,
                 data_evento=dt_evento_e,
-                titulo=titulo_e.strip(),
-                descricao=(desc_e or "").strip() or None,
+                titulo=titulo_e,
+                descricao=_clean(desc_e),
             )
 
             with get_session() as s:
                 AndamentosService.update(s, owner_user_id, andamento_id, payload)
 
             st.success("Andamento atualizado.")
+            clear_andamentos_cache()
             st.rerun()
         except Exception as e:
             st.error(f"Erro ao atualizar: {e}")
 
     # -------- excluir (com confirmação) --------
+    # o pedido fica em session_state: marcar o checkbox reexecuta só o fragment,
+    # e nesse rerun o submit "Excluir" do form já voltou a False
+    pending_key = "and_del_pending"
     if excluir:
+        st.session_state[pending_key] = andamento_id
+    if st.session_state.get(pending_key) == andamento_id:
         with st.container(border=True):
             st.warning("⚠️ Exclusão irreversível.")
             confirm = st.checkbox(
                 "Confirmo que desejo excluir este andamento.",
                 key=f"and_del_confirm_{andamento_id}",
             )
-            if st.button(
+            cdel1, cdel2 = st.columns(2)
+            if cdel2.button("Cancelar", key=f"and_del_cancel_{andamento_id}"):
+                st.session_state.pop(pending_key, None)
+                st.rerun(scope="fragment")
+            if cdel1.button(
                 "Confirmar exclusão",
                 type="primary",
                 disabled=not confirm,
@@ -269,7 +471,9 @@ def _section_edit_delete(
                 try:
                     with get_session() as s:
                         AndamentosService.delete(s, owner_user_id, andamento_id)
+                    st.session_state.pop(pending_key, None)
                     st.success("Andamento excluído.")
+                    clear_andamentos_cache()
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao excluir: {e}")
@@ -278,9 +482,13 @@ def _section_edit_delete(
 def render(owner_user_id: int):
     st.header("🧾 Andamentos")
 
-    processos, proc_labels, proc_label_to_id, proc_label_by_id = _load_processos(
-        owner_user_id
-    )
+    (
+        processos,
+        proc_labels,
+        proc_label_to_id,
+        proc_label_by_id,
+        proc_label_index,
+    ) = _load_processos(owner_user_id)
 
     if not processos:
         st.info("Cadastre um processo primeiro para registrar andamentos.")
@@ -290,7 +498,7 @@ def render(owner_user_id: int):
 
     st.divider()
 
-    andamentos, df = _section_list(
+    andamentos, df, filtros = _section_list(
         owner_user_id, proc_labels, proc_label_to_id, proc_label_by_id
     )
 
@@ -300,5 +508,11 @@ def render(owner_user_id: int):
     st.divider()
 
     _section_edit_delete(
-        owner_user_id, andamentos, proc_labels, proc_label_to_id, proc_label_by_id
+        owner_user_id,
+        andamentos,
+        filtros,
+        proc_labels,
+        proc_label_to_id,
+        proc_label_by_id,
+        proc_label_index,
     )
@@ -1,13 +1,15 @@
 # app/ui/dashboard.py
 import streamlit as st
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime, timedelta, time, date
 
-from sqlalchemy import select, func, case
+from sqlalchemy import select, func, case, and_, or_
+from sqlalchemy.orm import Session
 
 from db.connection import get_session
 from db.models import Processo, Prazo, LancamentoFinanceiro, Agendamento
-from core.utils import now_br, ensure_br, format_date_br
+from core.utils import BRAZIL_TZ, now_br
 from app.ui.theme import inject_global_css, card
 from app.ui_state import navigate
 from app.ui.components import page_header
@@ -32,20 +34,14 @@ def _naive(dt: datetime) -> datetime:
     return dt
 
 
-def _dias_restantes(dt) -> int:
-    dt_br = ensure_br(dt)
-    hoje = now_br().date()
-    return (dt_br.date() - hoje).days
+# faixas de Dias -> status (limites à direita inclusivos: <0, <=5, <=10, resto)
+_STATUS_BINS = (float("-inf"), -1, 5, 10, float("inf"))
+_STATUS_LABELS = ("🔴 Atrasado", "🟠 Urgente", "🟡 Atenção", "🟢 Ok")
+_PRIOR_BADGES = {"a": "🔥 Alta", "b": "🧊 Baixa"}
 
 
-def _status_prazo(dias: int) -> str:
-    if dias < 0:
-        return "🔴 Atrasado"
-    if dias <= 5:
-        return "🟠 Urgente"
-    if dias <= 10:
-        return "🟡 Atenção"
-    return "🟢 Ok"
+# troca "," <-> "." numa passada só (translate mapeia os caracteres ao mesmo tempo)
+_MONEY_TRANS = str.maketrans(",.", ".,")
 
 
 def _fmt_money_br(v: float) -> str:
@@ -53,7 +49,7 @@ def _fmt_money_br(v: float) -> str:
         v = float(v or 0)
     except Exception:
         v = 0.0
-    return f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{v:,.2f}".translate(_MONEY_TRANS)
 
 
 def _apply_tipo_filter(stmt, tipo_val):
@@ -66,15 +62,6 @@ def _pct(a: int, b: int) -> str:
     return f"{round((a / b) * 100)}%"
 
 
-def _prior_badge(p: str | None) -> str:
-    p = (p or "Média").strip()
-    if p.lower().startswith("a"):
-        return "🔥 Alta"
-    if p.lower().startswith("b"):
-        return "🧊 Baixa"
-    return "⚖️ Média"
-
-
 def _date_range_strings(hoje: date) -> tuple[str, str]:
     """Para cache_data: entradas hashable e estáveis."""
     ate7 = hoje + timedelta(days=7)
@@ -88,112 +75,101 @@ def _dt_bounds(hoje: date) -> tuple[datetime, datetime]:
     return start_today, end_7d
 
 
+def _to_br_naive(values) -> pd.Series:
+    """Coluna de datas no horário de SP, sem tz (mesma regra do ensure_br)."""
+    col = pd.Series(pd.to_datetime(values), copy=False)
+    if col.dt.tz is not None:
+        col = col.dt.tz_convert(BRAZIL_TZ).dt.tz_localize(None)
+    return col
+
+
+def _trabalho_col(df: pd.DataFrame) -> pd.Series:
+    tipo = df["tipo_acao"].fillna("").replace("", "Sem tipo")
+    return df["numero_processo"].astype(str) + " – " + tipo
+
+
 def _build_prazos_df(rows) -> pd.DataFrame:
-    data = []
-    for (
-        _id,
-        evento,
-        data_limite,
-        prioridade,
-        numero_processo,
-        tipo_acao,
-    ) in rows:
-        dias = int(_dias_restantes(data_limite))
-        data.append(
-            {
-                "Trabalho": f"{numero_processo} – {tipo_acao or 'Sem tipo'}",
-                "Evento": evento,
-                "Venc.": format_date_br(data_limite),
-                "Dias": dias,
-                "Status": _status_prazo(dias),
-                "Prior.": _prior_badge(prioridade),
-            }
-        )
-    if not data:
+    # coluna a coluna (pandas), sem montar um dict por linha
+    if not rows:
         return pd.DataFrame()
-    return pd.DataFrame(data).sort_values(by=["Dias", "Venc."], ascending=True)
+    df = pd.DataFrame.from_records(
+        rows,
+        columns=[
+            "id",
+            "evento",
+            "data_limite",
+            "prioridade",
+            "numero_processo",
+            "tipo_acao",
+        ],
+    )
+    venc = _to_br_naive(df["data_limite"])
+    dias = (venc.dt.normalize() - pd.Timestamp(now_br().date())).dt.days
+    prior = df["prioridade"].fillna("").str.strip().str[:1].str.lower()
+
+    out = pd.DataFrame(
+        {
+            "Trabalho": _trabalho_col(df),
+            "Evento": df["evento"],
+            "Venc.": venc.dt.strftime("%d/%m/%Y"),
+            "Dias": dias,
+            "Status": pd.cut(dias, _STATUS_BINS, labels=_STATUS_LABELS).astype(str),
+            "Prior.": prior.map(_PRIOR_BADGES).fillna("⚖️ Média"),
+        }
+    )
+    # rows já vêm do SQL por (data_limite, id); Dias é monótono nela: sem re-sort
+    return out
 
 
 def _build_agenda_df(rows) -> pd.DataFrame:
-    data = []
-    for _id, tipo, inicio, local, numero_processo, tipo_acao in rows:
-        data.append(
-            {
-                "Trabalho": f"{numero_processo} – {tipo_acao or 'Sem tipo'}",
-                "Tipo": tipo,
-                "Início": ensure_br(inicio).strftime("%d/%m/%Y %H:%M"),
-                "Local": local or "",
-            }
-        )
-    return pd.DataFrame(data) if data else pd.DataFrame()
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_records(
+        rows,
+        columns=["id", "tipo", "inicio", "local", "numero_processo", "tipo_acao"],
+    )
+    return pd.DataFrame(
+        {
+            "Trabalho": _trabalho_col(df),
+            "Tipo": df["tipo"],
+            "Início": _to_br_naive(df["inicio"]).dt.strftime("%d/%m/%Y %H:%M"),
+            "Local": df["local"].fillna(""),
+        }
+    )
 
 
 # -------------------------
 # Queries (cacheadas)
 # -------------------------
-@st.cache_data(show_spinner=False, ttl=45)
-def _fetch_kpis_cached(owner_user_id: int, tipo_val: str | None, hoje_iso: str) -> dict:
-    hoje_sp = date.fromisoformat(hoje_iso)
+# `_session` (prefixo "_" => fora da chave do cache): a sessão do render, para
+# as consultas de um mesmo render dividirem uma conexão/transação
 
-    start_today, end_7d = _dt_bounds(hoje_sp)
-    now = now_br()
-    now_n = _naive(now)
 
+@contextmanager
+def _use_session(session: Session | None):
+    if session is not None:
+        yield session
+        return
     with get_session() as s:
-        # Total processos
-        stmt_total = select(func.count(Processo.id)).where(
-            Processo.owner_user_id == owner_user_id
-        )
-        stmt_total = _apply_tipo_filter(stmt_total, tipo_val)
-        total_proc = int(s.execute(stmt_total).scalar_one())
+        yield s
 
-        # Ativos
-        stmt_ativos = select(func.count(Processo.id)).where(
-            Processo.owner_user_id == owner_user_id,
-            Processo.status == "Ativo",
-        )
-        stmt_ativos = _apply_tipo_filter(stmt_ativos, tipo_val)
-        ativos = int(s.execute(stmt_ativos).scalar_one())
 
-        # Prazos abertos + contagens por janela (SQL, sem loop Python)
-        stmt_prazos_counts = (
-            select(
-                func.count(Prazo.id).label("abertos"),
-                func.coalesce(
-                    func.sum(case((Prazo.data_limite < start_today, 1), else_=0)),
-                    0,
-                ).label("atrasados"),
-                func.coalesce(
-                    func.sum(
-                        case(
-                            (
-                                (Prazo.data_limite >= start_today)
-                                & (Prazo.data_limite <= end_7d),
-                                1,
-                            ),
-                            else_=0,
-                        )
-                    ),
-                    0,
-                ).label("em_7d"),
-            )
-            .select_from(Prazo)
-            .join(Processo, Processo.id == Prazo.processo_id)
-            .where(
-                Processo.owner_user_id == owner_user_id,
-                Prazo.concluido == False,  # noqa
-            )
-        )
-        stmt_prazos_counts = _apply_tipo_filter(stmt_prazos_counts, tipo_val)
-        prazos_abertos, prazos_atrasados, prazos_7dias = s.execute(
-            stmt_prazos_counts
-        ).one()
+@st.cache_data(show_spinner=False, ttl=45)
+def _fetch_kpis_cached(
+    owner_user_id: int,
+    tipo_val: str | None,
+    hoje_iso: str,
+    _session: Session | None = None,
+) -> dict:
+    hoje_sp = date.fromisoformat(hoje_iso)
 
-        prazos_abertos = int(prazos_abertos or 0)
-        prazos_atrasados = int(prazos_atrasados or 0)
-        prazos_7dias = int(prazos_7dias or 0)
+    start_today, end_7d = _dt_bounds(hoje_sp)
+    now = now_br()
+    now_n = _naive(now)
 
-        # Agenda 7 dias
+    with _use_session(_session) as s:
+        # Processos (total + ativos) e agenda 7d numa única ida ao banco:
+        # agregado condicional sobre Processo + contagem da agenda como subquery
         stmt_ag_7d = (
             select(func.count(Agendamento.id))
             .join(Processo, Processo.id == Agendamento.processo_id)
@@ -205,30 +181,48 @@ def _fetch_kpis_cached(owner_user_id: int, tipo_val: str | None, hoje_iso: str)
             )
         )
         stmt_ag_7d = _apply_tipo_filter(stmt_ag_7d, tipo_val)
-        ag_7d = int(s.execute(stmt_ag_7d).scalar_one())
 
-        # Financeiro (duas somas)
-        stmt_receitas = (
-            select(func.coalesce(func.sum(LancamentoFinanceiro.valor), 0))
-            .join(Processo, Processo.id == LancamentoFinanceiro.processo_id)
-            .where(
-                Processo.owner_user_id == owner_user_id,
-                LancamentoFinanceiro.tipo == "Receita",
+        stmt_proc = select(
+            func.count(Processo.id),
+            func.coalesce(func.sum(case((Processo.status == "Ativo", 1), else_=0)), 0),
+            # correlate(None): a subquery tem o próprio JOIN com Processo
+            stmt_ag_7d.correlate(None).scalar_subquery(),
+        ).where(Processo.owner_user_id == owner_user_id)
+        stmt_proc = _apply_tipo_filter(stmt_proc, tipo_val)
+        total_proc, ativos, ag_7d = s.execute(stmt_proc).one()
+
+        total_proc = int(total_proc or 0)
+        ativos = int(ativos or 0)
+        ag_7d = int(ag_7d or 0)
+
+        # Financeiro: uma passada, somas por tipo (GROUP BY em vez de duas consultas)
+        stmt_fin = (
+            select(
+                LancamentoFinanceiro.tipo,
+                func.coalesce(func.sum(LancamentoFinanceiro.valor), 0),
             )
-        )
-        stmt_despesas = (
-            select(func.coalesce(func.sum(LancamentoFinanceiro.valor), 0))
             .join(Processo, Processo.id == LancamentoFinanceiro.processo_id)
-            .where(
-                Processo.owner_user_id == owner_user_id,
-                LancamentoFinanceiro.tipo == "Despesa",
-            )
+            .where(Processo.owner_user_id == owner_user_id)
+            .group_by(LancamentoFinanceiro.tipo)
         )
-        stmt_receitas = _apply_tipo_filter(stmt_receitas, tipo_val)
-        stmt_despesas = _apply_tipo_filter(stmt_despesas, tipo_val)
+        stmt_fin = _apply_tipo_filter(stmt_fin, tipo_val)
+        fin = dict(s.execute(stmt_fin).all())
+
+    # prazos: contagens vêm da mesma consulta das tabelas da aba Prazos (cacheada
+    # com as mesmas chaves; o render reaproveita o resultado)
+    _, _, prazos_counts = _fetch_prazos_tables_cached(
+        owner_user_id,
+        tipo_val,
+        start_today.isoformat(timespec="seconds"),
+        end_7d.isoformat(timespec="seconds"),
+        _session=_session,
+    )
+    prazos_atrasados = prazos_counts.get(0, 0)
+    prazos_7dias = prazos_counts.get(1, 0)
+    prazos_abertos = sum(prazos_counts.values())
 
-        receitas = float(s.execute(stmt_receitas).scalar_one() or 0)
-        despesas = float(s.execute(stmt_despesas).scalar_one() or 0)
+    receitas = float(fin.get("Receita") or 0)
+    despesas = float(fin.get("Despesa") or 0)
 
     saldo = receitas - despesas
 
@@ -252,87 +246,89 @@ def _fetch_kpis_cached(owner_user_id: int, tipo_val: str | None, hoje_iso: str)
 
 @st.cache_data(show_spinner=False, ttl=45)
 def _fetch_prazos_tables_cached(
-    owner_user_id: int, tipo_val: str | None, start_today_iso: str, end_7d_iso: str
-) -> tuple[list, list]:
+    owner_user_id: int,
+    tipo_val: str | None,
+    start_today_iso: str,
+    end_7d_iso: str,
+    _session: Session | None = None,
+) -> tuple[list, list, dict[int, int]]:
+    """
+    Top 10 atrasados, top 10 até end_7d e contagem de prazos abertos por
+    bucket (0 = atrasado, 1 = até end_7d, 2 = depois), numa consulta só.
+    """
     start_today = datetime.fromisoformat(start_today_iso)
     end_7d = datetime.fromisoformat(end_7d_iso)
 
-    with get_session() as s:
-        stmt_atrasados = (
-            select(
-                Prazo.id,
-                Prazo.evento,
-                Prazo.data_limite,
-                Prazo.prioridade,
-                Processo.numero_processo,
-                Processo.tipo_acao,
-            )
-            .join(Processo, Processo.id == Prazo.processo_id)
-            .where(
-                Processo.owner_user_id == owner_user_id,
-                Prazo.concluido == False,  # noqa
-                Prazo.data_limite < start_today,
-            )
-            .order_by(Prazo.data_limite.asc())
-            .limit(10)
+    # um único scan dos prazos abertos: row_number por bucket pega o top 10 de
+    # cada um e count(*) por bucket dá os KPIs (em vez de três consultas)
+    bucket = case(
+        (Prazo.data_limite < start_today, 0),
+        (Prazo.data_limite <= end_7d, 1),
+        else_=2,
+    ).label("bucket")
+    rn = (
+        func.row_number()
+        .over(partition_by=bucket, order_by=(Prazo.data_limite.asc(), Prazo.id.asc()))
+        .label("rn")
+    )
+    n_bucket = func.count().over(partition_by=bucket).label("n_bucket")
+    inner = (
+        select(
+            Prazo.id,
+            Prazo.evento,
+            Prazo.data_limite,
+            Prazo.prioridade,
+            Processo.numero_processo,
+            Processo.tipo_acao,
+            bucket,
+            rn,
+            n_bucket,
         )
-        stmt_atrasados = _apply_tipo_filter(stmt_atrasados, tipo_val)
-        rows_atrasados = s.execute(stmt_atrasados).all()
-
-        stmt_7d = (
-            select(
-                Prazo.id,
-                Prazo.evento,
-                Prazo.data_limite,
-                Prazo.prioridade,
-                Processo.numero_processo,
-                Processo.tipo_acao,
-            )
-            .join(Processo, Processo.id == Prazo.processo_id)
-            .where(
-                Processo.owner_user_id == owner_user_id,
-                Prazo.concluido == False,  # noqa
-                Prazo.data_limite >= start_today,
-                Prazo.data_limite <= end_7d,
-            )
-            .order_by(Prazo.data_limite.asc())
-            .limit(10)
+        .join(Processo, Processo.id == Prazo.processo_id)
+        .where(
+            Processo.owner_user_id == owner_user_id,
+            Prazo.concluido == False,  # noqa
         )
-        stmt_7d = _apply_tipo_filter(stmt_7d, tipo_val)
-        rows_7d = s.execute(stmt_7d).all()
+    )
+    inner = _apply_tipo_filter(inner, tipo_val).subquery()
+    # top 10 dos buckets 0/1; do bucket 2 só a 1ª linha (carrega a contagem)
+    stmt = (
+        select(
+            inner.c.id,
+            inner.c.evento,
+            inner.c.data_limite,
+            inner.c.prioridade,
+            inner.c.numero_processo,
+            inner.c.tipo_acao,
+            inner.c.bucket,
+            inner.c.n_bucket,
+        )
+        .where(or_(inner.c.rn == 1, and_(inner.c.bucket < 2, inner.c.rn <= 10)))
+        .order_by(inner.c.data_limite.asc(), inner.c.id.asc())
+    )
 
-    return rows_atrasados, rows_7d
+    with _use_session(_session) as s:
+        rows = s.execute(stmt).all()
+
+    # fatias de Row já são tuplas simples: o cache não serializa metadados de Row
+    rows_atrasados = [r[:6] for r in rows if r.bucket == 0]
+    rows_7d = [r[:6] for r in rows if r.bucket == 1]
+    counts = {r.bucket: r.n_bucket for r in rows}
+    return rows_atrasados, rows_7d, counts
 
 
 @st.cache_data(show_spinner=False, ttl=45)
 def _fetch_agendamentos_cached(
-    owner_user_id: int, tipo_val: str | None, now_n_iso: str
+    owner_user_id: int,
+    tipo_val: str | None,
+    now_n_iso: str,
+    _session: Session | None = None,
 ) -> tuple[list, list]:
     now_n = datetime.fromisoformat(now_n_iso)
 
-    with get_session() as s:
-        stmt_24h = (
-            select(
-                Agendamento.id,
-                Agendamento.tipo,
-                Agendamento.inicio,
-                Agendamento.local,
-                Processo.numero_processo,
-                Processo.tipo_acao,
-            )
-            .join(Processo, Processo.id == Agendamento.processo_id)
-            .where(
-                Processo.owner_user_id == owner_user_id,
-                Agendamento.status == "Agendado",
-                Agendamento.inicio >= now_n,
-                Agendamento.inicio <= now_n + timedelta(hours=24),
-            )
-            .order_by(Agendamento.inicio.asc())
-            .limit(10)
-        )
-        stmt_24h = _apply_tipo_filter(stmt_24h, tipo_val)
-        rows_24h = s.execute(stmt_24h).all()
-
+    # uma consulta só: o top 10 de 24h é o prefixo do top 10 de 7 dias que cai
+    # em até 24h (mesma ordem por início, a partir de now_n)
+    with _use_session(_session) as s:
         stmt_7d = (
             select(
                 Agendamento.id,
@@ -353,14 +349,18 @@ def _fetch_agendamentos_cached(
             .limit(10)
         )
         stmt_7d = _apply_tipo_filter(stmt_7d, tipo_val)
-        rows_7d = s.execute(stmt_7d).all()
+        rows_7d = [tuple(r) for r in s.execute(stmt_7d)]
 
+    fim_24h = now_n + timedelta(hours=24)
+    rows_24h = [r for r in rows_7d if r[2] <= fim_24h]  # r[2] = inicio
     return rows_24h, rows_7d
 
 
 @st.cache_data(show_spinner=False, ttl=60)
-def _fetch_ultimos_processos_cached(owner_user_id: int, tipo_val: str | None) -> list:
-    with get_session() as s:
+def _fetch_ultimos_processos_cached(
+    owner_user_id: int, tipo_val: str | None, _session: Session | None = None
+) -> list:
+    with _use_session(_session) as s:
         stmt = (
             select(
                 Processo.id,
@@ -376,13 +376,20 @@ def _fetch_ultimos_processos_cached(owner_user_id: int, tipo_val: str | None) ->
             .limit(12)
         )
         stmt = _apply_tipo_filter(stmt, tipo_val)
-        return s.execute(stmt).all()
+        return [tuple(r) for r in s.execute(stmt)]
 
 
 # -------------------------
 # Render
 # -------------------------
 def render(owner_user_id: int):
+    # uma sessão para o render todo; a conexão só sai do pool se algum fetch
+    # não estiver no cache (Session conecta na primeira consulta)
+    with get_session() as s:
+        _render(owner_user_id, s)
+
+
+def _render(owner_user_id: int, s: Session):
     inject_global_css()
 
     # CSS leve para hierarquia / espaço
@@ -420,7 +427,7 @@ def render(owner_user_id: int):
 
     hoje_sp = now_br().date()
     hoje_iso, _ = _date_range_strings(hoje_sp)
-    k = _fetch_kpis_cached(owner_user_id, tipo_val, hoje_iso)
+    k = _fetch_kpis_cached(owner_user_id, tipo_val, hoje_iso, _session=s)
 
     pct_atraso = _pct(k["prazos_atrasados"], k["prazos_abertos"])
     pct_7d = _pct(k["prazos_7dias"], k["prazos_abertos"])
@@ -592,11 +599,12 @@ def render(owner_user_id: int):
     tab1, tab2, tab3 = st.tabs(["⏳ Prazos", "📅 Agenda", "🗂️ Trabalhos"])
 
     with tab1:
-        rows_atrasados, rows_7d = _fetch_prazos_tables_cached(
+        rows_atrasados, rows_7d, _ = _fetch_prazos_tables_cached(
             owner_user_id,
             tipo_val,
             k["start_today"].isoformat(timespec="seconds"),
             k["end_7d"].isoformat(timespec="seconds"),
+            _session=s,
         )
 
         colA, colB = st.columns(2, vertical_alignment="top")
@@ -627,7 +635,10 @@ def render(owner_user_id: int):
 
     with tab2:
         rows_24h, rows_ag_7d = _fetch_agendamentos_cached(
-            owner_user_id, tipo_val, k["now_n"].isoformat(timespec="seconds")
+            owner_user_id,
+            tipo_val,
+            k["now_n"].isoformat(timespec="seconds"),
+            _session=s,
         )
 
         col1, col2 = st.columns(2, vertical_alignment="top")
@@ -655,7 +666,7 @@ def render(owner_user_id: int):
                     )
 
     with tab3:
-        procs = _fetch_ultimos_processos_cached(owner_user_id, tipo_val)
+        procs = _fetch_ultimos_processos_cached(owner_user_id, tipo_val, _session=s)
 
         with st.container(border=True):
             st.subheader("Últimos trabalhos")
@@ -181,6 +181,19 @@ def _pick_folder_dialog(initialdir: str | None = None) -> str | None:
 # -------------------------
 # Navegação programática
 # -------------------------
+def _invalidate_processos_caches() -> None:
+    """Outras telas cacheiam a lista de trabalhos (selects); relê após mudanças."""
+    from app.ui.agendamentos import clear_agendamentos_cache, clear_processos_cache
+    from app.ui.andamentos import clear_andamentos_cache
+    from app.ui.andamentos import clear_processos_cache as _clear_andamentos_procs
+
+    clear_processos_cache()
+    _clear_andamentos_procs()
+    # excluir trabalho leva junto agendamentos/andamentos (listas cacheadas)
+    clear_agendamentos_cache()
+    clear_andamentos_cache()
+
+
 def _request_tab(tab: str, processo_id: int | None = None) -> None:
     if processo_id is not None:
         st.session_state["proc_edit_selected_id"] = int(processo_id)
@@ -473,6 +486,7 @@ def render(owner_user_id: int):
                             getattr(created, "id", 0) or 0
                         )
                         st.session_state["proc_last_created_ref"] = numero.strip()
+                        _invalidate_processos_caches()
                         _toast("✅ Trabalho cadastrado")
                         st.rerun()
                     except Exception as e:
@@ -790,6 +804,7 @@ def render(owner_user_id: int):
                 try:
                     with get_session() as s:
                         ProcessosService.delete(s, owner_user_id, int(selected_id))
+                    _invalidate_processos_caches()
                     st.success("Trabalho excluído.")
                     st.session_state.pop("proc_edit_selected_id", None)
                     st.session_state.pop("proc_edit_select", None)
@@ -897,6 +912,7 @@ def render(owner_user_id: int):
                                 observacoes=(obs_e or "").strip(),
                             ),
                         )
+                    _invalidate_processos_caches()
                     _toast("✅ Trabalho atualizado")
                     st.success("Trabalho atualizado.")
                     st.rerun()
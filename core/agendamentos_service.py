@@ -2,10 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-from sqlalchemy import asc, delete, desc, select, update
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, asc, delete, desc, func, or_, select, update
+from sqlalchemy.orm import Session, raiseload
 
 from db.models import Agendamento, Processo
 
@@ -36,6 +36,29 @@ class AgendamentoUpdate:
     status: Optional[str] = None
 
 
+class AgendamentoRecord(NamedTuple):
+    """Linha de agendamento desacoplada da sessão (pode ir para st.cache_data)."""
+
+    id: int
+    processo_id: int
+    tipo: str
+    status: str
+    inicio: datetime
+    fim: Optional[datetime]
+    local: Optional[str]
+    descricao: Optional[str]
+
+
+class AgendamentoPickerItem(NamedTuple):
+    """Só o necessário para o label do seletor de edição (sem local/descricao)."""
+
+    id: int
+    processo_id: int
+    inicio: datetime
+    tipo: str
+    status: str
+
+
 class AgendamentosService:
     # -------------------------
     # Helpers
@@ -70,19 +93,61 @@ class AgendamentosService:
     def _assert_processo_owner(
         session: Session, owner_user_id: int, processo_id: int
     ) -> None:
-        proc = (
-            session.execute(
-                select(Processo).where(
-                    Processo.id == int(processo_id),
-                    Processo.owner_user_id == int(owner_user_id),
-                )
+        # só o id: existência + dono, sem hidratar a linha inteira do Processo
+        proc_id = session.scalar(
+            select(Processo.id).where(
+                Processo.id == int(processo_id),
+                Processo.owner_user_id == int(owner_user_id),
             )
-            .scalars()
-            .first()
         )
-        if not proc:
+        if proc_id is None:
             raise ValueError("Processo não encontrado (ou não pertence ao usuário)")
 
+    @staticmethod
+    def _keyset_after(cursor: Tuple[datetime, int], forward: bool):
+        """Linhas depois de (inicio, id) na ordem asc (forward) ou desc."""
+        inicio, ag_id = cursor
+        if forward:
+            return or_(
+                Agendamento.inicio > inicio,
+                and_(Agendamento.inicio == inicio, Agendamento.id > int(ag_id)),
+            )
+        return or_(
+            Agendamento.inicio < inicio,
+            and_(Agendamento.inicio == inicio, Agendamento.id < int(ag_id)),
+        )
+
+    @staticmethod
+    def _apply_filters(
+        stmt,
+        owner_user_id: int,
+        processo_id: Optional[int],
+        tipo: Optional[str],
+        status: Optional[str],
+        q: Optional[str],
+    ):
+        """Filtros comuns da listagem (dono, trabalho, tipo, status, busca)."""
+        stmt = stmt.join(Processo, Processo.id == Agendamento.processo_id).where(
+            Processo.owner_user_id == int(owner_user_id)
+        )
+
+        if processo_id is not None:
+            stmt = stmt.where(Agendamento.processo_id == int(processo_id))
+
+        if tipo:
+            stmt = stmt.where(Agendamento.tipo == tipo)
+
+        if status:
+            stmt = stmt.where(Agendamento.status == status)
+
+        q_clean = AgendamentosService._clean_str(q)
+        if q_clean:
+            like = f"%{q_clean}%"
+            stmt = stmt.where(
+                (Agendamento.local.ilike(like)) | (Agendamento.descricao.ilike(like))
+            )
+        return stmt
+
     @staticmethod
     def _compute_flags_for_update(
         *,
@@ -157,39 +222,136 @@ class AgendamentosService:
         q: Optional[str] = None,
         order: str = "asc",
         limit: int = 300,
+        after: Optional[Tuple[datetime, int]] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        now_bound: Optional[datetime] = None,
     ) -> List[Agendamento]:
+        """
+        Paginação por cursor (keyset), sem OFFSET:
+        - after=(inicio, id) da última linha => próxima página
+        - before=(inicio, id) da primeira linha => página anterior
+        Cada página custa O(limit), independente de quantas já passaram.
+
+        now_bound: janela no próprio banco (coluna indexada, sem função em volta):
+        order="asc" => inicio >= now_bound (próximos); "desc" => inicio <= now_bound.
+        """
         limit = int(limit)
         if limit <= 0:
             limit = 100
         if limit > 1000:
             limit = 1000
 
-        stmt = (
-            select(Agendamento)
-            .join(Processo, Processo.id == Agendamento.processo_id)
-            .where(Processo.owner_user_id == int(owner_user_id))
+        # listagem só lê colunas: acesso a relationship vira erro, não N+1 silencioso
+        stmt = AgendamentosService._apply_filters(
+            select(Agendamento).options(raiseload("*")),
+            owner_user_id,
+            processo_id,
+            tipo,
+            status,
+            q,
         )
 
-        if processo_id is not None:
-            stmt = stmt.where(Agendamento.processo_id == int(processo_id))
+        forward = order == "asc"
+        if now_bound is not None:
+            stmt = stmt.where(
+                Agendamento.inicio >= now_bound
+                if forward
+                else Agendamento.inicio <= now_bound
+            )
 
-        if tipo:
-            stmt = stmt.where(Agendamento.tipo == tipo)
+        if after is not None:
+            stmt = stmt.where(AgendamentosService._keyset_after(after, forward))
 
-        if status:
-            stmt = stmt.where(Agendamento.status == status)
+        # página anterior: busca na ordem inversa e reinverte no final
+        backwards = before is not None
+        if backwards:
+            stmt = stmt.where(AgendamentosService._keyset_after(before, not forward))
 
-        q_clean = AgendamentosService._clean_str(q)
-        if q_clean:
-            like = f"%{q_clean}%"
-            stmt = stmt.where(
-                (Agendamento.local.ilike(like)) | (Agendamento.descricao.ilike(like))
+        direction = asc if forward != backwards else desc
+        stmt = stmt.order_by(direction(Agendamento.inicio), direction(Agendamento.id))
+
+        rows = list(session.execute(stmt.limit(limit)).scalars().all())
+        if backwards:
+            rows.reverse()
+        return rows
+
+    @staticmethod
+    def list_records(
+        session: Session, owner_user_id: int, **filters
+    ) -> List[AgendamentoRecord]:
+        """Mesmos filtros/paginação do list(), devolvendo AgendamentoRecord."""
+        return [
+            AgendamentosService.to_record(a)
+            for a in AgendamentosService.list(session, owner_user_id, **filters)
+        ]
+
+    @staticmethod
+    def to_record(a: Agendamento) -> AgendamentoRecord:
+        return AgendamentoRecord(
+            a.id,
+            a.processo_id,
+            a.tipo,
+            a.status,
+            a.inicio,
+            a.fim,
+            a.local,
+            a.descricao,
+        )
+
+    @staticmethod
+    def list_for_picker(
+        session: Session, owner_user_id: int, limit: int = 500
+    ) -> List[AgendamentoPickerItem]:
+        """
+        Seletor de edição: projeção só com as colunas do label, mais recentes
+        primeiro. Não trafega local/descricao (TEXT) de centenas de linhas.
+        """
+        stmt = (
+            select(
+                Agendamento.id,
+                Agendamento.processo_id,
+                Agendamento.inicio,
+                Agendamento.tipo,
+                Agendamento.status,
             )
+            .join(Processo, Processo.id == Agendamento.processo_id)
+            .where(Processo.owner_user_id == int(owner_user_id))
+            .order_by(desc(Agendamento.inicio), desc(Agendamento.id))
+            .limit(int(limit))
+        )
+        return [AgendamentoPickerItem(*r) for r in session.execute(stmt).all()]
 
-        stmt = stmt.order_by(
-            asc(Agendamento.inicio) if order == "asc" else desc(Agendamento.inicio)
+    @staticmethod
+    def status_counts(
+        session: Session,
+        owner_user_id: int,
+        processo_id: Optional[int] = None,
+        tipo: Optional[str] = None,
+        status: Optional[str] = None,
+        q: Optional[str] = None,
+        order: str = "asc",
+        now_bound: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        Contagem por status com os mesmos filtros do list(), via GROUP BY;
+        order/now_bound aplicam a mesma janela (próximos/recentes) da lista.
+        """
+        stmt = AgendamentosService._apply_filters(
+            select(Agendamento.status, func.count(Agendamento.id)),
+            owner_user_id,
+            processo_id,
+            tipo,
+            status,
+            q,
         )
-        return list(session.execute(stmt.limit(limit)).scalars().all())
+        if now_bound is not None:
+            stmt = stmt.where(
+                Agendamento.inicio >= now_bound
+                if order == "asc"
+                else Agendamento.inicio <= now_bound
+            )
+        stmt = stmt.group_by(Agendamento.status)
+        return {st: int(n) for st, n in session.execute(stmt).all()}
 
     @staticmethod
     def get(
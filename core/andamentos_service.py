@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import NamedTuple, Optional, List
 from datetime import datetime
 
 from sqlalchemy import select, update, delete, desc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, raiseload
 
 from db.models import Andamento, Processo
 
@@ -26,6 +26,16 @@ class AndamentoUpdate:
     descricao: Optional[str] = None
 
 
+class AndamentoRecord(NamedTuple):
+    """Linha de andamento desacoplada da sessão (pode ir para st.cache_data)."""
+
+    id: int
+    processo_id: int
+    data_evento: datetime
+    titulo: str
+    descricao: Optional[str]
+
+
 class AndamentosService:
     @staticmethod
     def _clean_str(val: Optional[str]) -> Optional[str]:
@@ -38,19 +48,26 @@ class AndamentosService:
     def _assert_processo_owner(
         session: Session, owner_user_id: int, processo_id: int
     ) -> None:
-        proc = (
-            session.execute(
-                select(Processo).where(
-                    Processo.id == processo_id,
-                    Processo.owner_user_id == owner_user_id,
-                )
+        # só o id: existência + dono, sem hidratar a linha inteira do Processo
+        proc_id = session.scalar(
+            select(Processo.id).where(
+                Processo.id == processo_id,
+                Processo.owner_user_id == owner_user_id,
             )
-            .scalars()
-            .first()
         )
-        if not proc:
+        if proc_id is None:
             raise ValueError("Processo não encontrado (ou não pertence ao usuário)")
 
+    @staticmethod
+    def _owned_where(owner_user_id: int, andamento_id: int):
+        # id + dono no próprio WHERE do UPDATE/DELETE (subquery em vez de JOIN)
+        return (
+            Andamento.id == int(andamento_id),
+            Andamento.processo_id.in_(
+                select(Processo.id).where(Processo.owner_user_id == owner_user_id)
+            ),
+        )
+
     @staticmethod
     def create(
         session: Session, owner_user_id: int, payload: AndamentoCreate
@@ -75,17 +92,17 @@ class AndamentosService:
         return a
 
     @staticmethod
-    def list(
-        session: Session,
+    def _list_stmt(
+        stmt,
         owner_user_id: int,
         processo_id: Optional[int] = None,
         q: Optional[str] = None,
         limit: int = 300,
-    ) -> List[Andamento]:
-        stmt = (
-            select(Andamento)
-            .join(Processo, Processo.id == Andamento.processo_id)
-            .where(Processo.owner_user_id == owner_user_id)
+        offset: int = 0,
+    ):
+        # filtros/ordem/página comuns a list() e list_records()
+        stmt = stmt.join(Processo, Processo.id == Andamento.processo_id).where(
+            Processo.owner_user_id == owner_user_id
         )
 
         if processo_id:
@@ -101,8 +118,51 @@ class AndamentosService:
         stmt = stmt.order_by(desc(Andamento.data_evento), desc(Andamento.id)).limit(
             int(limit)
         )
+        if offset:
+            stmt = stmt.offset(int(offset))
+        return stmt
+
+    @staticmethod
+    def list(
+        session: Session,
+        owner_user_id: int,
+        processo_id: Optional[int] = None,
+        q: Optional[str] = None,
+        limit: int = 300,
+        offset: int = 0,
+    ) -> List[Andamento]:
+        # listagem só lê colunas: acesso a relationship vira erro, não N+1 silencioso
+        stmt = AndamentosService._list_stmt(
+            select(Andamento).options(raiseload("*")),
+            owner_user_id,
+            processo_id=processo_id,
+            q=q,
+            limit=limit,
+            offset=offset,
+        )
         return list(session.execute(stmt).scalars().all())
 
+    @staticmethod
+    def list_records(
+        session: Session, owner_user_id: int, **filters
+    ) -> List[AndamentoRecord]:
+        """
+        Mesmos filtros do list(), devolvendo AndamentoRecord. Seleciona só as
+        colunas (tuplas do Core): sem identity map nem objetos ORM na leitura.
+        """
+        stmt = AndamentosService._list_stmt(
+            select(
+                Andamento.id,
+                Andamento.processo_id,
+                Andamento.data_evento,
+                Andamento.titulo,
+                Andamento.descricao,
+            ),
+            owner_user_id,
+            **filters,
+        )
+        return [AndamentoRecord._make(row) for row in session.execute(stmt)]
+
     @staticmethod
     def get(
         session: Session, owner_user_id: int, andamento_id: int
@@ -124,10 +184,6 @@ class AndamentosService:
         andamento_id: int,
         payload: AndamentoUpdate,
     ) -> None:
-        a = AndamentosService.get(session, owner_user_id, int(andamento_id))
-        if not a:
-            raise ValueError("Andamento não encontrado")
-
         data = {}
 
         # processo_id
@@ -151,19 +207,33 @@ class AndamentosService:
         if payload.descricao is not None:
             data["descricao"] = AndamentosService._clean_str(payload.descricao)
 
-        if data:
-            session.execute(
-                update(Andamento)
-                .where(Andamento.id == int(andamento_id))
-                .values(**data)
-            )
-            session.commit()
+        if not data:
+            # nada a gravar: só confirma existência + dono
+            if AndamentosService.get(session, owner_user_id, andamento_id) is None:
+                raise ValueError("Andamento não encontrado")
+            return
+
+        # um UPDATE já filtrado por dono: rowcount 0 => não existe (ou não é dele),
+        # sem o SELECT prévio da linha
+        res = session.execute(
+            update(Andamento)
+            .where(*AndamentosService._owned_where(owner_user_id, andamento_id))
+            .values(**data)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount == 0:
+            session.rollback()
+            raise ValueError("Andamento não encontrado")
+        session.commit()
 
     @staticmethod
     def delete(session: Session, owner_user_id: int, andamento_id: int) -> None:
-        a = AndamentosService.get(session, owner_user_id, int(andamento_id))
-        if not a:
+        res = session.execute(
+            delete(Andamento)
+            .where(*AndamentosService._owned_where(owner_user_id, andamento_id))
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount == 0:
+            session.rollback()
             raise ValueError("Andamento não encontrado")
-
-        session.execute(delete(Andamento).where(Andamento.id == int(andamento_id)))
         session.commit()
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 import sqlite3
-from typing import Optional
+from typing import Optional, Tuple
 from pathlib import Path
 
 from sqlalchemy import create_engine, event
@@ -63,14 +63,24 @@ class Base(DeclarativeBase):
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
     """
-    Ativa foreign keys no SQLite.
+    Ativa foreign keys e ajustes de desempenho no SQLite.
     Importante: só executa se a conexão for sqlite3.
+
+    Roda uma vez por conexão DBAPI (evento "connect"), não por query:
+    - WAL: leitores não bloqueiam escritores (reruns do Streamlit + backup)
+    - synchronous=NORMAL: seguro em WAL, sem fsync a cada commit
+    - temp_store/mmap_size/cache_size: menos I/O em ordenações e leituras
     """
     try:
         # sqlite3 connections come from module "sqlite3"
         if dbapi_connection.__class__.__module__.startswith("sqlite3"):
             cursor = dbapi_connection.cursor()
             cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+            cursor.execute("PRAGMA cache_size=-65536")  # 64 MiB
             cursor.close()
     except Exception:
         pass
@@ -84,48 +94,68 @@ _engine: Optional[Engine] = None
 _SessionLocal = None
 
 
+def _build_engine() -> Tuple[Engine, sessionmaker]:
+    db_url = get_db_url()
+
+    # --------------------------
+    # SQLITE
+    # --------------------------
+    if db_url.startswith("sqlite"):
+        connect_args = {
+            "check_same_thread": False,
+            "detect_types": sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        }
+
+        engine = create_engine(
+            db_url,
+            echo=False,
+            future=True,
+            connect_args=connect_args,
+        )
+
+    # --------------------------
+    # POSTGRESQL (NEON)
+    # --------------------------
+    else:
+        engine = create_engine(
+            db_url,
+            echo=False,
+            future=True,
+            pool_pre_ping=True,
+            pool_size=1,
+            max_overflow=0,
+            connect_args={"sslmode": "require"},
+        )
+
+    session_factory = sessionmaker(
+        bind=engine,
+        autoflush=False,
+        autocommit=False,
+        future=True,
+    )
+    return engine, session_factory
+
+
+# Dentro do Streamlit, engine + sessionmaker ficam em st.cache_resource: um por
+# processo do servidor, inclusive quando o Streamlit recarrega os módulos após
+# editar o código (o global acima seria zerado e o pool recriado).
+# Fora dele (scripts/cron), segue o singleton de módulo.
+try:
+    from streamlit import runtime as _st_runtime
+
+    if _st_runtime.exists():
+        import streamlit as st
+
+        _build_engine = st.cache_resource(show_spinner=False)(_build_engine)
+except Exception:
+    pass
+
+
 def get_engine() -> Engine:
     global _engine, _SessionLocal
 
     if _engine is None:
-        db_url = get_db_url()
-
-        # --------------------------
-        # SQLITE
-        # --------------------------
-        if db_url.startswith("sqlite"):
-            connect_args = {
-                "check_same_thread": False,
-                "detect_types": sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
-            }
-
-            _engine = create_engine(
-                db_url,
-                echo=False,
-                future=True,
-                connect_args=connect_args,
-            )
-
-        # --------------------------
-        # POSTGRESQL (NEON)
-        # --------------------------
-        else:
-            _engine = create_engine(
-                db_url,
-                echo=False,
-                future=True,
-                pool_pre_ping=True,
-                pool_size=1,
-                max_overflow=0,
-                connect_args={"sslmode": "require"},
-            )
-
-        _SessionLocal = sessionmaker(
-            bind=_engine,
-            autoflush=False,
-            autocommit=False,
-            future=True,
-        )
+        _engine, _SessionLocal = _build_engine()
 
     return _engine
 
@@ -4,7 +4,7 @@ import os
 from datetime import datetime
 
 from dotenv import load_dotenv
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
@@ -145,11 +145,64 @@ def _seed_feriados_basicos(ano: int) -> None:
         s.commit()
 
 
+# busca "contém" (ILIKE '%termo%') das listas: b-tree não ajuda com % no início
+_TRGM_INDEXES = (
+    ("ix_agendamentos_local_trgm", "agendamentos", "local"),
+    ("ix_agendamentos_descricao_trgm", "agendamentos", "descricao"),
+    ("ix_andamentos_titulo_trgm", "andamentos", "titulo"),
+    ("ix_andamentos_descricao_trgm", "andamentos", "descricao"),
+)
+
+
+def _ensure_trgm_indexes(engine) -> None:
+    """
+    Só Postgres: índices GIN pg_trgm para os filtros de texto (ILIKE).
+    No SQLite não há equivalente simples; segue o scan (volume pequeno).
+    Falha aqui não impede o app de subir (ex.: sem permissão p/ extensão).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for name, table, column in _TRGM_INDEXES:
+                conn.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS {name} "
+                        f"ON {table} USING gin ({column} gin_trgm_ops)"
+                    )
+                )
+    except Exception:
+        pass
+
+
+# índices substituídos por outros cujo prefixo os cobre (ver models):
+# criar o novo não remove o antigo em bancos já existentes
+_SUPERSEDED_INDEXES = (
+    # -> ix_processos_owner_papel_status (owner_user_id, papel, status)
+    "ix_processos_owner_papel",
+)
+
+
+def _drop_superseded_indexes(engine) -> None:
+    """Remove índices antigos (DROP INDEX IF EXISTS vale p/ SQLite e Postgres)."""
+    with engine.begin() as conn:
+        for name in _SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
 def init_db(seed_feriados: bool = True, ano_seed: int | None = None) -> None:
     load_dotenv()  # garante que DB_URL funcione no Streamlit também
 
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    # create_all não mexe em tabelas já existentes: cria os índices novos
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    # só depois dos novos existirem: as consultas nunca ficam sem índice
+    _drop_superseded_indexes(engine)
+    _ensure_trgm_indexes(engine)
 
     default_email = os.getenv("DEFAULT_USER_EMAIL", "admin@local").strip()
     default_name = os.getenv("DEFAULT_USER_NAME", "Admin Local").strip()
@@ -50,7 +50,9 @@ class Processo(Base):
     __table_args__ = (
         UniqueConstraint("owner_user_id", "numero_processo", name="uq_owner_numero"),
         Index("ix_processos_owner_status", "owner_user_id", "status"),
-        Index("ix_processos_owner_papel", "owner_user_id", "papel"),
+        # (owner, papel, status) cobre os KPIs do painel por atuação (count + ativos)
+        # e, pelo prefixo, os filtros só por (owner, papel)
+        Index("ix_processos_owner_papel_status", "owner_user_id", "papel", "status"),
         Index("ix_processos_owner_categoria", "owner_user_id", "categoria_servico"),
     )
 
@@ -190,6 +192,8 @@ class Agendamento(Base):
     __tablename__ = "agendamentos"
     __table_args__ = (
         Index("ix_agendamentos_status_inicio", "status", "inicio"),
+        # listagem por cursor: ORDER BY inicio, id + filtro de janela em inicio
+        Index("ix_agendamentos_inicio_id", "inicio", "id"),
         Index("ix_agendamentos_alertas", "alerta_24h_enviado", "alerta_2h_enviado"),
     )
 
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import sqlite3
 import sys
 from dataclasses import dataclass
@@ -103,9 +104,13 @@ def write_last_backup_manifest(backup_dir: Path, result: BackupResult) -> Path:
             else None
         ),
     }
-    manifest.write_text(
-        json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    # escrita atômica: o app (sidebar) nunca lê um manifesto truncado
+    tmp = manifest.with_suffix(".json.tmp")
+    with open(tmp, "wb") as f:
+        f.write(json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, manifest)
     return manifest
 
 